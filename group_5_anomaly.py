@@ -0,0 +1,188 @@
+from collections import deque
+import math
+import time
+import numpy as np
+from group_5_sequence import device_key
+import group_5_config as config
+
+BATCH_CHUNK = 2048
+
+
+class DeviceBaseline:
+    # Exponentially weighted mean and variance of one device's readings
+    __slots__ = ("count", "mean", "variance")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+
+class AnomalyEvent:
+    __slots__ = ("time", "device_id", "value", "score")
+
+    def __init__(self, device_id, value, score):
+        self.time = time.time()
+        self.device_id = device_id
+        self.value = value
+        self.score = score
+
+
+class AnomalyDetector:
+    def __init__(self, alpha=config.ANOMALY_ALPHA, threshold=config.ANOMALY_Z_THRESHOLD,
+                 warmup=config.ANOMALY_WARMUP, min_std=config.ANOMALY_MIN_STD, on_anomaly=None):
+        if not 0 < alpha < 1:
+            raise ValueError("Anomaly alpha must be between 0 and 1.")
+        self.alpha = alpha
+        self.decay = 1.0 - alpha
+        # Keeps decay ** -i well inside float64 range for the closed-form EWMA in observe_batch
+        self.chunk_size = max(1, min(BATCH_CHUNK, int(300 / -math.log(self.decay))))
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self.on_anomaly = on_anomaly
+        # Until a device has a baseline, fall back to the configured static range
+        spread = config.EXPECTED_VARIANCE * config.OUT_OF_RANGE_THRESHOLD_FACTOR
+        self.static_min = config.EXPECTED_BASE - spread
+        self.static_max = config.EXPECTED_BASE + spread
+        self.devices = {}
+        self.events = deque(maxlen=config.ANOMALY_EVENT_HISTORY)
+        self.checked = 0
+        self.anomalies = 0
+
+    def clear(self):
+        self.devices.clear()
+        self.events.clear()
+        self.checked = 0
+        self.anomalies = 0
+
+    @property
+    def rate(self):
+        return self.anomalies / self.checked if self.checked else 0.0
+
+    def baseline(self, device_id):
+        key = device_key(device_id)
+        baseline = self.devices.get(key)
+        if baseline is None:
+            baseline = self.devices[key] = DeviceBaseline()
+        return baseline
+
+    def observe(self, device_id, value):
+        # Returns the z-score of value against the device baseline, or None if it is normal
+        baseline = self.baseline(device_id)
+        self.checked += 1
+        if baseline.count == 0:
+            baseline.mean = value
+            baseline.count = 1
+            return self.check_static(device_id, value)
+        std = max(math.sqrt(baseline.variance), self.min_std)
+        deviation = value - baseline.mean
+        score = deviation / std
+        if baseline.count < self.warmup:
+            anomaly = not (self.static_min <= value <= self.static_max)
+        else:
+            anomaly = abs(score) > self.threshold
+        if anomaly:
+            # Clamp before updating so one wild reading can't blow up the baseline
+            limit = self.threshold * std
+            deviation = limit if deviation > 0 else -limit
+        baseline.mean += self.alpha * deviation
+        baseline.variance = self.decay * (baseline.variance + self.alpha * deviation * deviation)
+        baseline.count += 1
+        if anomaly:
+            self.record(device_id, value, score)
+            return score
+        return None
+
+    def check_static(self, device_id, value):
+        if self.static_min <= value <= self.static_max:
+            return None
+        score = math.inf if value > self.static_max else -math.inf
+        self.record(device_id, value, score)
+        return score
+
+    def record(self, device_id, value, score):
+        self.anomalies += 1
+        event = AnomalyEvent(device_id, value, score)
+        self.events.append(event)
+        if self.on_anomaly:
+            self.on_anomaly(event)
+
+    def observe_batch(self, device_ids, values):
+        # Vectorized observe for many readings; returns a boolean mask of anomalies
+        values = np.asarray(values, dtype=np.float64)
+        mask = np.zeros(len(values), dtype=bool)
+        scores = np.zeros(len(values), dtype=np.float64)
+        groups = {}
+        for index, device_id in enumerate(device_ids):
+            groups.setdefault(device_key(device_id), []).append(index)
+        for key, indices in groups.items():
+            indices = np.asarray(indices, dtype=np.intp)
+            for start in range(0, len(indices), self.chunk_size):
+                chunk = indices[start:start + self.chunk_size]
+                mask[chunk], scores[chunk] = self.observe_chunk(key, values[chunk])
+        self.checked += len(values)
+        for index in np.flatnonzero(mask):
+            self.record(device_ids[index], float(values[index]), float(scores[index]))
+        return mask
+
+    def observe_chunk(self, key, x):
+        baseline = self.devices.get(key)
+        if baseline is None:
+            baseline = self.devices[key] = DeviceBaseline()
+        flags = np.zeros(len(x), dtype=bool)
+        scores = np.zeros(len(x), dtype=np.float64)
+        first = 0
+        if baseline.count == 0:
+            if not self.static_min <= x[0] <= self.static_max:
+                flags[0] = True
+                scores[0] = math.inf if x[0] > self.static_max else -math.inf
+            baseline.mean = float(x[0])
+            baseline.count = 1
+            first = 1
+        # Vectorized up to the next flagged reading, which is then clamped into the baseline as
+        # observe does, and the rest of the chunk is scored again from there. Exact for any
+        # number of anomalies, with one pass per flagged reading plus one
+        alpha, decay = self.alpha, self.decay
+        position = first
+        while position < len(x):
+            rest = x[position:]
+            means, variances = self.ewma_before(baseline, rest)
+            stds = np.maximum(np.sqrt(variances), self.min_std)
+            rest_scores = (rest - means) / stds
+            warm = baseline.count + np.arange(len(rest)) >= self.warmup
+            static = (rest < self.static_min) | (rest > self.static_max)
+            hits = np.flatnonzero(np.where(warm, np.abs(rest_scores) > self.threshold, static))
+            normal = hits[0] if len(hits) else len(rest)
+            scores[position:position + normal] = rest_scores[:normal]
+            if normal:
+                deviation = rest[normal - 1] - means[normal - 1]
+                baseline.mean = float(means[normal - 1] + alpha * deviation)
+                baseline.variance = float(decay * (variances[normal - 1] + alpha * deviation * deviation))
+                baseline.count += int(normal)
+            if normal == len(rest):
+                break
+            index = position + normal
+            limit = self.threshold * stds[normal]
+            deviation = limit if rest[normal] > means[normal] else -limit
+            flags[index] = True
+            scores[index] = rest_scores[normal]
+            baseline.mean = float(means[normal] + alpha * deviation)
+            baseline.variance = float(decay * (variances[normal] + alpha * deviation * deviation))
+            baseline.count += 1
+            position = index + 1
+        return flags, scores
+
+    def ewma_before(self, baseline, x):
+        # Closed form of mean_i = w * mean_{i-1} + a * x_i and
+        # var_i = w * (var_{i-1} + a * (x_i - mean_{i-1}) ** 2), as the state before each reading
+        a, w = self.alpha, self.decay
+        powers = w ** np.arange(1, len(x) + 1)
+        means = np.empty(len(x))
+        means[0] = baseline.mean
+        means[1:] = (powers * (baseline.mean + a * np.cumsum(x / powers)))[:-1]
+        deviations = x - means
+        variances = np.empty(len(x))
+        variances[0] = baseline.variance
+        variances[1:] = (powers * (baseline.variance + a * w * np.cumsum(deviations * deviations / powers)))[:-1]
+        return means, variances
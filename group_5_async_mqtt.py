@@ -0,0 +1,290 @@
+import asyncio
+import itertools
+import random
+import threading
+import paho.mqtt.client as mqtt
+import group_5_config as config
+
+
+def parse_brokers(text, default_port=int(config.MQTT_BROKER_PORT)):
+    # "host1:1883, host2, host3:1884" -> [("host1", 1883), ("host2", default_port), ("host3", 1884)]
+    brokers = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        brokers.append((host or config.MQTT_BROKER_URL, int(port) if port else default_port))
+    return brokers
+
+
+class AsyncConnection:
+    # One paho client whose socket is served by the pool's event loop instead of its own
+    # network thread (paho's on_socket_* hooks). Connects and reconnects with backoff
+    def __init__(self, pool, index, host, port):
+        self.pool = pool
+        self.index = index
+        self.host = host
+        self.port = port
+        self.client = mqtt.Client(client_id=f"{pool.client_id_prefix}-{index}-{random.getrandbits(32):08x}")
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        self.client.on_publish = self.on_publish
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+        self.subscriptions = []
+        self.connected = False
+        self.attempts = 0
+        self.connects = 0
+        self.failures = 0
+        self.connect_task = None
+        self.misc_task = None
+
+    @property
+    def label(self):
+        return f"{self.host}:{self.port}#{self.index}"
+
+    def schedule_connect(self):
+        if not self.pool.closing and (self.connect_task is None or self.connect_task.done()):
+            self.connect_task = self.pool.loop.create_task(self.connect())
+
+    async def connect(self):
+        # Retries until connected or the pool closes. paho's connect() blocks the loop for the
+        # TCP handshake, bounded by its connect timeout
+        while not self.pool.closing:
+            if self.attempts:
+                await asyncio.sleep(self.pool.backoff(self.attempts))
+            self.attempts += 1
+            try:
+                self.client.connect(self.host, self.port, self.pool.keepalive)
+                return
+            except OSError as e:
+                self.failures += 1
+                self.pool.log(f"Connection to {self.label} failed (attempt {self.attempts}): {e}", "warning")
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            self.failures += 1
+            self.pool.log(f"Broker {self.label} refused the connection with code {rc}", "warning")
+            client.disconnect()
+            return
+        self.connected = True
+        self.attempts = 0
+        self.connects += 1
+        if self.connects > 1:
+            self.pool.reconnects += 1
+            self.pool.log(f"Reconnected to {self.label}", "info")
+        if self.subscriptions:
+            client.subscribe(self.subscriptions)
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        if not self.pool.closing:
+            self.pool.log(f"Lost connection to {self.label} (code {rc}), reconnecting", "warning")
+            self.schedule_connect()
+
+    def on_message(self, client, userdata, msg):
+        on_message = self.pool.on_message
+        if on_message is not None:
+            on_message(self.pool, userdata, msg)
+
+    def on_publish(self, client, userdata, mid):
+        on_publish = self.pool.on_publish
+        if on_publish is not None:
+            on_publish(self.pool, userdata, self.pool.global_mid(self.index, mid))
+
+    def on_socket_open(self, client, userdata, sock):
+        self.pool.loop.add_reader(sock, client.loop_read)
+        self.misc_task = self.pool.loop.create_task(self.misc())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.pool.loop.remove_reader(sock)
+        self.pool.loop.remove_writer(sock)
+        if self.misc_task is not None:
+            self.misc_task.cancel()
+            self.misc_task = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        # publish() may run on any thread; the loop is only touched from its own
+        self.pool.call_in_loop(self.add_writer, sock)
+
+    def add_writer(self, sock):
+        if self.client.socket() is sock:
+            self.pool.loop.add_writer(sock, self.client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.pool.call_in_loop(self.pool.loop.remove_writer, sock)
+
+    async def misc(self):
+        # Keepalive pings and ack retries. Also flushes a packet queued by another thread in the
+        # instant the writer was being unregistered
+        client = self.client
+        while client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            if client.want_write():
+                client.loop_write()
+            await asyncio.sleep(1.0)
+
+
+class ConnectionPool:
+    # Many MQTT connections, spread over several brokers, served by one asyncio event loop.
+    # It stands in for a paho client in LoadEngine and SubscriberCore: publish(), is_connected(),
+    # on_message and on_publish behave the same, with publishes routed to a connection by key
+    # (e.g. a device id) so every device keeps its order. Use start()/stop() to run the loop on
+    # a background thread, or await open()/close() from a loop of your own
+    def __init__(self, brokers, connections_per_broker=config.POOL_CONNECTIONS_PER_BROKER,
+                 keepalive=config.POOL_KEEPALIVE, min_delay=config.RECONNECT_MIN_DELAY,
+                 max_delay=config.RECONNECT_MAX_DELAY, client_id_prefix="group5", log=None):
+        if not brokers:
+            raise ValueError("At least one broker is required.")
+        if connections_per_broker < 1:
+            raise ValueError("Each broker needs at least one connection.")
+        self.brokers = list(dict.fromkeys(brokers))
+        self.keepalive = keepalive
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.client_id_prefix = client_id_prefix
+        self.log = log or (lambda message, level: None)
+        self.on_message = None
+        self.on_publish = None
+        self.loop = None
+        self.loop_thread = None
+        self.thread = None
+        self.closing = False
+        self.stopped = None
+        self.reconnects = 0
+        self.connections = []
+        self.by_broker = {}
+        for host, port in self.brokers:
+            for _ in range(connections_per_broker):
+                connection = AsyncConnection(self, len(self.connections), host, port)
+                self.connections.append(connection)
+                self.by_broker.setdefault((host, port), []).append(connection)
+        # Publishes without a key stick to one connection per calling thread
+        self.thread_connections = {}
+        self.next_thread_connection = itertools.count()
+
+    def __len__(self):
+        return len(self.connections)
+
+    @property
+    def connected(self):
+        return sum(1 for connection in self.connections if connection.connected)
+
+    @property
+    def failures(self):
+        return sum(connection.failures for connection in self.connections)
+
+    def backoff(self, attempts):
+        # Exponential with jitter so many connections to a recovering broker don't retry in step
+        delay = min(self.max_delay, self.min_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def call_in_loop(self, function, *args):
+        if threading.get_ident() == self.loop_thread:
+            function(*args)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(function, *args)
+
+    def global_mid(self, index, mid):
+        # paho message ids are per connection; the pool's are unique across connections
+        return mid * len(self.connections) + index
+
+    def connection_for(self, key):
+        if key is None:
+            thread = threading.get_ident()
+            index = self.thread_connections.get(thread)
+            if index is None:
+                index = self.thread_connections[thread] = next(self.next_thread_connection) % len(self.connections)
+            return self.connections[index]
+        return self.connections[hash(key) % len(self.connections)]
+
+    # paho client surface
+
+    def is_connected(self):
+        return any(connection.connected for connection in self.connections)
+
+    def can_publish(self, key=None):
+        # Whether publish() with this key would go out now
+        return self.connection_for(key).connected
+
+    def max_inflight_messages_set(self, inflight):
+        for connection in self.connections:
+            connection.client.max_inflight_messages_set(inflight)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, key=None):
+        # Returns (rc, mid) like paho; MQTT_ERR_NO_CONN while that connection is reconnecting
+        connection = self.connection_for(key)
+        if not connection.connected:
+            return mqtt.MQTT_ERR_NO_CONN, 0
+        info = connection.client.publish(topic, payload, qos=qos, retain=retain)
+        return info.rc, self.global_mid(connection.index, info.mid)
+
+    def subscribe(self, topic_filters, qos=0):
+        # Every broker gets every filter, spread over that broker's connections
+        if isinstance(topic_filters, str):
+            topic_filters = [topic_filters]
+        for connections in self.by_broker.values():
+            for position, topic_filter in enumerate(topic_filters):
+                connection = connections[position % len(connections)]
+                connection.subscriptions.append((topic_filter, qos))
+                if connection.connected:
+                    self.call_in_loop(connection.client.subscribe, topic_filter, qos)
+
+    # asyncio lifecycle
+
+    async def open(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.closing = False
+        for connection in self.connections:
+            connection.schedule_connect()
+
+    async def wait_connected(self, timeout):
+        # True once every connection is up, False on timeout
+        deadline = self.loop.time() + timeout
+        while self.connected < len(self.connections):
+            if self.loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def close(self):
+        self.closing = True
+        for connection in self.connections:
+            if connection.connect_task is not None:
+                connection.connect_task.cancel()
+            if connection.connected:
+                connection.client.disconnect()
+                connection.connected = False
+        # Let the disconnect packets go out before the sockets are dropped
+        await asyncio.sleep(0.1)
+
+    # Background thread lifecycle
+
+    def start(self, timeout=None):
+        # Runs the loop on its own thread; with a timeout, waits that long for every connection
+        ready = threading.Event()
+
+        async def serve():
+            self.stopped = asyncio.Event()
+            await self.open()
+            ready.set()
+            await self.stopped.wait()
+            await self.close()
+
+        self.thread = threading.Thread(target=asyncio.run, args=(serve(),), name="mqtt-pool", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if timeout:
+            return asyncio.run_coroutine_threadsafe(self.wait_connected(timeout), self.loop).result()
+        return self.is_connected()
+
+    def stop(self, timeout=2.0):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.stopped.set)
+        self.thread.join(timeout)
+        self.thread = None
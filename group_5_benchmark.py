@@ -0,0 +1,447 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import paho.mqtt.client as mqtt
+from group_5_anomaly import AnomalyDetector
+from group_5_data_generator import DataGenerator
+from group_5_mqtt_utils import MQTTUtils, PacketBuilder, ENVELOPE_RECORD
+from group_5_replay import build_subscriber, build_gui_subscriber, release
+from group_5_sequence import SequenceTracker
+from group_5_sharded_ingest import build_payloads, decode_readings, split_payload
+from group_5_spool import Spool
+import group_5_config as config
+
+DEFAULT_THRESHOLD = 0.15   # FRACTION SLOWER THAN BASELINE THAT COUNTS AS A REGRESSION
+
+
+class FakeMessage:
+    __slots__ = ("topic", "payload", "qos", "retain", "mid")
+
+    def __init__(self, topic, payload, mid):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+        self.mid = mid
+
+
+class FakeClient:
+    # Stands in for paho: publish hands the payload straight to the subscribers' on_message
+    def __init__(self):
+        self.subscribers = []
+        self.mid = 0
+        self.on_publish = None
+
+    def is_connected(self):
+        return True
+
+    def max_inflight_messages_set(self, inflight):
+        pass
+
+    def subscribe(self, on_message):
+        self.subscribers.append(on_message)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.mid += 1
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        message = FakeMessage(topic, payload, self.mid)
+        for on_message in self.subscribers:
+            on_message(self, None, message)
+        if self.on_publish:
+            self.on_publish(self, None, self.mid)
+        return mqtt.MQTT_ERR_SUCCESS, self.mid
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(function, iterations, items_per_call=1):
+    clock = time.perf_counter_ns
+    latencies = [0] * iterations
+    started = clock()
+    for i in range(iterations):
+        call_started = clock()
+        function(i)
+        latencies[i] = clock() - call_started
+    total = clock() - started
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations * items_per_call / (total / 1e9),
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+    }
+
+
+def bench_package_data(n, factory):
+    return measure(lambda i: MQTTUtils.package_data(50.0 + i % 10, i), n)
+
+
+def bench_packet_builder(n, factory):
+    builder = PacketBuilder(1000)
+    return measure(lambda i: builder.json(50.0 + i % 10, builder.next_id()), n)
+
+
+def bench_package_binary(n, factory):
+    return measure(lambda i: MQTTUtils.package_binary(50.0 + i % 10, i), n)
+
+
+def bench_unpack_data(n, factory):
+    payloads = [MQTTUtils.package_data(50.0 + i % 10, i) for i in range(min(n, 10000))]
+    return measure(lambda i: MQTTUtils.unpack_data(payloads[i % len(payloads)]), n)
+
+
+def bench_unpack_binary(n, factory):
+    payloads = [MQTTUtils.package_binary(50.0 + i % 10, i) for i in range(min(n, 10000))]
+    return measure(lambda i: MQTTUtils.unpack_binary(payloads[i % len(payloads)]), n)
+
+
+def compressed_batch(size):
+    generator = DataGenerator(50, 10, 0, "normal")
+    return [MQTTUtils.make_reading(generator.generate(), i // 10, 1000 + i % 10) for i in range(size)]
+
+
+def bench_package_compressed(n, factory):
+    readings = compressed_batch(100)
+    return measure(lambda i: MQTTUtils.package_compressed(readings), max(1, n // 100), items_per_call=100)
+
+
+def bench_unpack_compressed(n, factory):
+    payload = MQTTUtils.package_compressed(compressed_batch(100))
+    return measure(lambda i: MQTTUtils.unpack_compressed_arrays(payload), max(1, n // 100), items_per_call=100)
+
+
+def bench_spool_append(n, factory):
+    builder = PacketBuilder(1000)
+    with tempfile.TemporaryDirectory() as directory:
+        spool = Spool(directory)
+        result = measure(lambda i: spool.append(builder.reading(50.0 + i % 10, i)), n)
+        spool.close()
+    return result
+
+
+def bench_spool_drain(n, factory):
+    # Read, wrap in a binary envelope and commit, as the drain thread does per batch
+    builder = PacketBuilder(1000)
+    batch = config.SPOOL_DRAIN_BATCH
+    with tempfile.TemporaryDirectory() as directory:
+        spool = Spool(directory)
+        spool.extend(builder.reading(50.0 + i % 10, i) for i in range(n))
+
+        def drain(i):
+            records, token = spool.peek(batch)
+            MQTTUtils.package_envelope_records(records)
+            spool.commit(len(records) // ENVELOPE_RECORD.size, token)
+        result = measure(drain, max(1, n // batch), items_per_call=batch)
+        spool.close()
+    return result
+
+
+def shard_payloads(wire_format, batch=100, devices=50):
+    # Envelopes mixing many devices, as a batching publisher sends them
+    return build_payloads(batch * devices, devices, wire_format, batch)
+
+
+def bench_shard_split(wire_format):
+    # Parent-side routing cost per envelope with four ingest workers, on the paho thread
+    def bench(n, factory):
+        payloads = shard_payloads(wire_format)
+        cache = {}
+        return measure(lambda i: split_payload(payloads[i % len(payloads)], 4, cache), max(1, n // 100),
+                       items_per_call=100)
+    return bench
+
+
+def bench_shard_decode(wire_format):
+    # Worker-side decode of the same envelopes, for comparison with the split
+    def bench(n, factory):
+        payloads = shard_payloads(wire_format)
+        return measure(lambda i: decode_readings(payloads[i % len(payloads)]), max(1, n // 100),
+                       items_per_call=100)
+    return bench
+
+
+def bench_generate(pattern):
+    def bench(n, factory):
+        generator = DataGenerator(50, 10, 0, pattern)
+        return measure(lambda i: generator.generate(), n)
+    return bench
+
+
+def bench_generate_batch(n, factory):
+    generator = DataGenerator(50, 10, 0, "spike", rng=0)
+    size = 10000
+    return measure(lambda i: generator.generate_batch(size), max(1, n // size), items_per_call=size)
+
+
+def bench_process_data(n, factory):
+    subscriber = factory()
+    start = datetime.now()
+    readings = [{"timestamp": (start + timedelta(milliseconds=i)).isoformat(), "packet_id": i,
+                 "value": 50.0 + i % 10, "device_id": f"device_{1000 + i % 100}"} for i in range(n)]
+    return measure(lambda i: subscriber.process_data(readings[i]), n)
+
+
+def bench_update_plot(n, factory):
+    subscriber = factory()
+    start = datetime.now()
+    for i in range(config.MAX_DATA_POINTS):
+        subscriber.process_data({"timestamp": start + timedelta(milliseconds=i), "packet_id": i,
+                                 "value": 50.0 + i % 10, "device_id": 1000})
+    subscriber.update_plot()
+    return measure(lambda i: subscriber.update_plot(), max(1, n // 1000))
+
+
+def bench_publish_receive(n, factory):
+    subscriber = factory()
+    client = FakeClient()
+    client.subscribe(subscriber.on_message)
+    generator = DataGenerator(50, 10, 0, "normal")
+    ingest = subscriber.ingest_queue
+
+    def cycle(i):
+        client.publish(config.MQTT_TOPIC, MQTTUtils.package_data(generator.generate(), i))
+        subscriber.process_message(*ingest.get_nowait())
+    return measure(cycle, n)
+
+
+BENCHMARKS = {
+    "package_data": bench_package_data,
+    "packet_builder": bench_packet_builder,
+    "package_binary": bench_package_binary,
+    "unpack_data": bench_unpack_data,
+    "unpack_binary": bench_unpack_binary,
+    "package_compressed": bench_package_compressed,
+    "unpack_compressed": bench_unpack_compressed,
+    "spool_append": bench_spool_append,
+    "spool_drain": bench_spool_drain,
+    "shard_split_json": bench_shard_split("json"),
+    "shard_split_binary": bench_shard_split("binary"),
+    "shard_split_compressed": bench_shard_split("compressed"),
+    "shard_decode_json": bench_shard_decode("json"),
+    "shard_decode_binary": bench_shard_decode("binary"),
+    "shard_decode_compressed": bench_shard_decode("compressed"),
+    "generate_normal": bench_generate("normal"),
+    "generate_sinusoidal": bench_generate("sinusoidal"),
+    "generate_spike": bench_generate("spike"),
+    "generate_batch": bench_generate_batch,
+    "process_data": bench_process_data,
+    "update_plot": bench_update_plot,
+    "publish_receive": bench_publish_receive,
+}
+
+# Need a plot, so they run against SubscriberGUI rather than the headless core
+GUI_BENCHMARKS = {"update_plot"}
+
+
+def gui_available():
+    # Tk needs a display; on a headless host (CI) creating the root raises TclError
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return False
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+    except Exception:
+        return False
+    return True
+
+
+def run_benchmarks(names=None, iterations=100000, subscriber_factory=build_subscriber,
+                   gui_factory=build_gui_subscriber):
+    results = {}
+    skipped = []
+    gui = None
+    for name in names or BENCHMARKS:
+        factory = subscriber_factory
+        if name in GUI_BENCHMARKS:
+            if gui is None:
+                gui = gui_factory is not build_gui_subscriber or gui_available()
+            if not gui:
+                print(f"Skipping {name}: no display for Tk", file=sys.stderr)
+                skipped.append(name)
+                continue
+            factory = gui_factory
+        created = []
+
+        def tracked(factory=factory):
+            subscriber = factory()
+            created.append(subscriber)
+            return subscriber
+        try:
+            results[name] = BENCHMARKS[name](iterations, tracked)
+        finally:
+            for subscriber in created:
+                release(subscriber)
+    return {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def check_sequence_start():
+    # Packets reordered at the start of a stream: once a full run of ids has arrived nothing
+    # is missing, and the count never goes negative on the way
+    failures = []
+    for order in [(10, 8, 9), (5, 3, 4, 2), (7, 5), (4, 1, 2, 3, 0)]:
+        tracker = SequenceTracker()
+        counts = []
+        for packet_id in order:
+            tracker.observe(1, packet_id, 0)
+            counts.append(tracker.missing)
+        expected = max(order) - min(order) + 1 - len(order)
+        if min(counts) < 0 or tracker.missing != expected or tracker.get(1).missing != expected:
+            failures.append(f"ids {order}: missing {counts}, expected {expected} at the end")
+    return failures
+
+
+def check_spool_overflow():
+    # The spool overflows between the drain's peek and its commit: the commit must not skip
+    # unsent readings of the next segment, and every reading is drained or counted as overflowed
+    failures = []
+    builder = PacketBuilder(1000)
+    for published in (True, False):
+        with tempfile.TemporaryDirectory() as directory:
+            spool = Spool(directory, segment_records=4, max_segments=2)
+            spool.extend(builder.reading(50.0, i) for i in range(6))
+            records, token = spool.peek(4)
+            sent = [record[0] for record in ENVELOPE_RECORD.iter_unpack(records)] if published else []
+            # Fills the second segment and opens a third, which drops the one being drained
+            spool.extend(builder.reading(50.0, i) for i in range(6, 9))
+            if published:
+                spool.commit(len(sent), token)
+            while True:
+                records, token = spool.peek(3)
+                if not records:
+                    break
+                sent.extend(record[0] for record in ENVELOPE_RECORD.iter_unpack(records))
+                spool.commit(len(records) // ENVELOPE_RECORD.size, token)
+            expected = list(range(9)) if published else list(range(4, 9))
+            if sent != expected:
+                failures.append(f"published={published}: drained ids {sent}, expected {expected}")
+            if spool.backlog or spool.drained + spool.overflowed != spool.appended:
+                failures.append(f"published={published}: backlog {spool.backlog}, drained {spool.drained} + "
+                                f"overflowed {spool.overflowed} != appended {spool.appended}")
+            spool.close()
+    return failures
+
+
+def check_anomaly_batch(batches=300, size=100, devices=3, seed=0):
+    # The same random readings, with two or three wild values per batch, through observe and
+    # observe_batch: flags and final baselines must agree
+    failures = []
+    rng = np.random.default_rng(seed)
+    scalar, batch = AnomalyDetector(), AnomalyDetector()
+    for number in range(batches):
+        device_ids = rng.integers(0, devices, size).tolist()
+        values = rng.normal(config.EXPECTED_BASE, 2.0, size)
+        wild = rng.choice(size, rng.integers(2, 4), replace=False)
+        values[wild] += rng.choice([-1, 1], len(wild)) * rng.uniform(30, 300, len(wild))
+        expected = np.array([scalar.observe(device_id, value) is not None
+                             for device_id, value in zip(device_ids, values.tolist())])
+        flags = batch.observe_batch(device_ids, values)
+        baselines_match = all(
+            math.isclose(scalar.devices[key].mean, batch.devices[key].mean, rel_tol=1e-9, abs_tol=1e-9)
+            and math.isclose(scalar.devices[key].variance, batch.devices[key].variance, rel_tol=1e-9, abs_tol=1e-9)
+            and scalar.devices[key].count == batch.devices[key].count for key in scalar.devices)
+        if not np.array_equal(expected, flags) or not baselines_match:
+            failures.append(f"batch {number}: observe_batch differs from observe")
+    return failures
+
+
+# Correctness checks run with --verify; each returns a list of failure descriptions
+CHECKS = {
+    "anomaly_batch": check_anomaly_batch,
+    "sequence_start": check_sequence_start,
+    "spool_overflow": check_spool_overflow,
+}
+
+
+def run_checks(names=None):
+    # {name: failures} for every check
+    return {name: CHECKS[name]() for name in names or CHECKS}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    # Returns (name, metric, baseline, current) for every result worse than threshold allows
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append((name, "ops_per_sec", base["ops_per_sec"], result["ops_per_sec"]))
+        if result["p50_us"] > base["p50_us"] * (1 + threshold):
+            regressions.append((name, "p50_us", base["p50_us"], result["p50_us"]))
+    return regressions
+
+
+def format_results(report, baseline=None):
+    lines = [f"{'benchmark':<26}{'ops/sec':>14}{'p50 us':>10}{'p99 us':>10}{'vs base':>10}"]
+    for name, result in report["results"].items():
+        change = ""
+        if baseline and name in baseline["results"]:
+            change = f"{result['ops_per_sec'] / baseline['results'][name]['ops_per_sec'] - 1:+.1%}"
+        lines.append(f"{name:<26}{result['ops_per_sec']:>14,.0f}{result['p50_us']:>10.2f}"
+                     f"{result['p99_us']:>10.2f}{change:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the publish and ingest hot paths")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, default all: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail if results regress against this baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--verify", action="store_true",
+                        help=f"run the correctness checks instead, exit 1 on a failure: {', '.join(CHECKS)}")
+    args = parser.parse_args(argv)
+    if args.verify:
+        failed = False
+        for name, failures in run_checks().items():
+            failed |= bool(failures)
+            print(f"{name:<26}{'FAILED' if failures else 'ok'}")
+            for failure in failures:
+                print(f"  {failure}")
+        return 1 if failed else 0
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = run_benchmarks(args.names, args.iterations)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_results(report, baseline))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+    if baseline:
+        regressions = compare(baseline, report, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.2f} -> {after:.2f}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,5 +9,119 @@ PUBLISHING_TIME = 0.5
 # CONNECTION SETTINGS
 MQTT_BROKER_URL = "localhost"
 MQTT_BROKER_PORT = "1883"
-MQTT_TOPIC = "iot/data"
+MQTT_TOPIC = "iot/data"   # COMMA-SEPARATED FILTERS, + AND # WILDCARDS ALLOWED
+WIRE_FORMAT = "json"   # "json", "binary" OR "compressed" (DELTA-OF-DELTA / XOR ENVELOPES, NEEDS BATCHING)
+BATCH_MAX_READINGS = 1    # READINGS PER ENVELOPE, 1 DISABLES BATCHING
+BATCH_MAX_DELAY_MS = 200
+COMPRESSED_TIME_UNIT_NS = 1000000   # TIMESTAMP RESOLUTION OF COMPRESSED ENVELOPES, 1 KEEPS NANOSECONDS
 
+
+# CONNECTION POOL SETTINGS
+MQTT_BROKERS = None   # "host:port,host:port" SPREADS THE CLI ENGINES OVER SEVERAL BROKERS, None USES THE BROKER ABOVE
+POOL_CONNECTIONS_PER_BROKER = 1   # MORE THAN 1 (OR SEVERAL BROKERS) SWITCHES TO THE ASYNCIO CONNECTION POOL
+POOL_KEEPALIVE = 60
+RECONNECT_MIN_DELAY = 0.5   # SECONDS BEFORE THE FIRST RETRY, DOUBLING PER FAILED ATTEMPT
+RECONNECT_MAX_DELAY = 30.0
+
+
+# QoS AND FLOW CONTROL SETTINGS
+PUBLISH_QOS = 0   # 1 OR 2 TRACKS ACKS IN AN IN-FLIGHT WINDOW AND ADAPTS THE PUBLISH RATE
+MAX_INFLIGHT = 100   # UNACKNOWLEDGED QoS 1/2 MESSAGES ALLOWED AT ONCE
+ACK_TIMEOUT = 5.0   # SECONDS BEFORE AN UNACKNOWLEDGED MESSAGE IS SENT AGAIN
+ACK_MAX_RETRIES = 3
+ACK_FAST_SECONDS = 0.05   # MEAN ACK LATENCY BELOW THIS LETS THE RATE RAMP UP
+RATE_CONTROL_INTERVAL = 0.5   # SECONDS BETWEEN RATE ADJUSTMENTS
+RATE_INCREASE = 0.05   # FRACTION OF THE TARGET RATE ADDED PER FAST INTERVAL
+RATE_DECREASE = 0.5   # RATE MULTIPLIER WHEN THE WINDOW FILLS OR AN ACK TIMES OUT
+RATE_MAX_SCALE = 1.0   # CEILING AS A MULTIPLE OF THE TARGET RATE, ABOVE 1 PROBES FOR MORE
+
+
+# LOAD GENERATOR SETTINGS
+LOAD_DEVICE_COUNT = 1000
+LOAD_FIRST_DEVICE_ID = 100000
+LOAD_TARGET_RATE = 1000   # TOTAL MESSAGES PER SECOND ACROSS ALL DEVICES
+LOAD_RATE_SPREAD = 0.5    # PER-DEVICE RATE VARIES BY +/- THIS FRACTION
+LOAD_WORKERS = 4
+LOAD_REPORT_INTERVAL = 1.0
+WILD_DATA_CHANCE = 0.005
+
+
+# OFFLINE SPOOL SETTINGS
+SPOOL_ENABLED = False   # KEEP READINGS ON DISK WHILE DISCONNECTED AND SEND THEM AFTER RECONNECTING
+SPOOL_DIRECTORY = "group_5_spool"
+SPOOL_SEGMENT_RECORDS = 65536   # 28-BYTE READINGS PER SEGMENT FILE
+SPOOL_MAX_SEGMENTS = 256   # ABOUT 470 MB, THE OLDEST SEGMENT IS DROPPED WHEN FULL
+SPOOL_DRAIN_BATCH = 500   # READINGS PER DRAINED ENVELOPE
+SPOOL_DRAIN_MAX_RATE = 50000   # READINGS PER SECOND, SCALED BY THE ADAPTIVE RATE AT QoS 1/2
+SPOOL_DRAIN_WINDOW_SHARE = 0.5   # FRACTION OF THE IN-FLIGHT WINDOW THE DRAIN MAY FILL, THE REST IS FOR LIVE DATA
+SPOOL_FLUSH_INTERVAL = 1.0   # SECONDS BETWEEN SAVES OF THE DRAIN POSITION
+
+
+# SCHEDULER SETTINGS
+SCHEDULER_POLICY = "catch_up"   # catch_up REPLAYS MISSED PUBLISHES AFTER A STALL, skip DROPS THEM
+SCHEDULER_MAX_BACKLOG = 1.0   # SECONDS BEHIND BEFORE catch_up GIVES UP AND SKIPS AHEAD TOO
+
+
+# SUBSCRIBER INGEST SETTINGS
+INGEST_QUEUE_SIZE = 10000   # MESSAGES BUFFERED BETWEEN PAHO AND TK, EXTRA ARE DROPPED
+INGEST_DRAIN_BATCH = 2000   # MESSAGES PROCESSED PER DRAIN TICK
+INGEST_DRAIN_INTERVAL_MS = 10
+RENDER_FPS = 20   # PLOT AND STATS REFRESH RATE
+RAW_LOG_MAX_PER_FRAME = 50   # NEWEST RAW READINGS SHOWN PER REFRESH
+CAPTURE_PATH = None   # FILE TO RECORD RAW PAYLOADS TO FOR group_5_replay.py, None DISABLES
+SEQUENCE_WINDOW = 128   # PACKETS PER DEVICE TRACKED FOR LATE AND DUPLICATE DETECTION
+INGEST_WORKERS = 0   # PROCESSES THAT DECODE AND TRACK SEQUENCES, SHARDED BY DEVICE, 0 KEEPS IT ON THE TK THREAD
+SHARD_SUBMIT_BATCH = 256   # PAYLOADS HANDED TO A WORKER AT ONCE
+SHARD_MAX_PENDING_BATCHES = 64   # UNPROCESSED HANDOFFS PER WORKER BEFORE PAYLOADS ARE DROPPED
+SHARD_RING_ROWS = 262144   # RESULT ROWS BUFFERED IN SHARED MEMORY PER WORKER
+SHARD_DEVICE_SLOTS = 65536   # DEVICES PER WORKER WITH THEIR OWN SHARED STATISTICS ROW
+
+
+# TOPIC ROUTING SETTINGS
+PIPELINE_KEY = "topic"   # topic, filter OR device: WHAT EACH PLOT SERIES AND ITS STATISTICS FOLLOW
+PIPELINE_MAX = 256   # FURTHER KEYS SHARE ONE "(other)" PIPELINE
+PIPELINE_RAW_POINTS = 500
+PIPELINE_HISTORY_TIERS = [(10, 360), (60, 1440)]   # SMALLER ROLLUPS THAN THE MAIN PLOT, ONE SET PER PIPELINE
+TOPIC_CACHE_SIZE = 4096   # RESOLVED TOPICS REMEMBERED BEFORE THE CACHE IS RESET
+
+
+# PLOT HISTORY SETTINGS
+HISTORY_TIERS = [(1, 3600), (10, 8640), (60, 10080)]   # (BUCKET SECONDS, BUCKETS KEPT) PER ROLLUP TIER
+PLOT_WINDOWS = {"Live": 0, "1 min": 60, "10 min": 600, "1 hour": 3600, "1 day": 86400, "1 week": 604800}
+
+
+# ANOMALY DETECTION SETTINGS
+ANOMALY_ALPHA = 0.05   # EWMA WEIGHT OF EACH NEW READING
+ANOMALY_Z_THRESHOLD = 6
+ANOMALY_WARMUP = 20   # READINGS PER DEVICE CHECKED AGAINST THE STATIC RANGE FIRST
+ANOMALY_MIN_STD = 0.5
+ANOMALY_EVENT_HISTORY = 1000
+
+
+# PERSISTENT STORE SETTINGS
+STORE_ENABLED = False
+STORE_DIRECTORY = "group_5_data"
+STORE_SEGMENT_ROWS = 1000000   # ROWS PER SEGMENT BEFORE ROTATING
+STORE_INDEX_STRIDE = 4096   # ROWS PER SPARSE TIME INDEX ENTRY
+STORE_RETENTION_SECONDS = 3 * 86400
+STORE_MAX_SEGMENTS = 200   # 0 KEEPS SEGMENTS UNTIL THEY EXPIRE
+STORE_FLUSH_INTERVAL = 5.0
+STORE_COMPRESS_SEALED = False   # REWRITE FULL SEGMENTS AS COMPRESSED BLOCKS, ONE PER INDEX STRIDE
+STORE_COMPRESS_TIME_UNIT_NS = 1000   # TIMESTAMP RESOLUTION OF COMPRESSED SEGMENTS
+
+
+# METRICS SETTINGS
+METRICS_HOST = "127.0.0.1"
+METRICS_PUBLISHER_PORT = 9101   # PROMETHEUS TEXT AT http://HOST:PORT/metrics, 0 DISABLES
+METRICS_SUBSCRIBER_PORT = 9102
+METRICS_PUBLISHER_SNAPSHOT = None   # JSON FILE REWRITTEN EVERY INTERVAL, None DISABLES
+METRICS_SUBSCRIBER_SNAPSHOT = None
+METRICS_SNAPSHOT_INTERVAL = 1.0
+
+
+# LOG VIEW SETTINGS
+LOG_MAX_LINES = 1000   # LINES KEPT IN EACH STATUS LOG, OLDER ONES ARE TRIMMED
+LOG_LEVEL = "info"   # debug, info, warning OR error
+LOG_COALESCE_SECONDS = 1.0   # SIMILAR MESSAGES IN THIS WINDOW COLLAPSE INTO ONE "x N similar" LINE, 0 DISABLES
+LOG_FLUSH_INTERVAL_MS = 100
+RAW_LOG_MAX_LINES = 600   # LINES KEPT IN THE SUBSCRIBER RAW DATA LOG
@@ -1,16 +1,18 @@
 import random
 import math
+import numpy as np
 import group_5_config as config
 
 
 class DataGenerator:
-    def __init__(self, base_value=50, variance=10, trend=0, pattern_type="normal"):
+    def __init__(self, base_value=50, variance=10, trend=0, pattern_type="normal", rng=None):
         self.base_value = base_value
         self.variance = variance
         self.trend = trend
         self.pattern_type = pattern_type
         self.time_offset = 0
         self.last_value = base_value
+        self.rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
 
     def generate(self):
         self.time_offset += 1
@@ -26,7 +28,34 @@ class DataGenerator:
         self.last_value = value
         return value
 
+    def generate_batch(self, n, rng=None):
+        rng = self.rng if rng is None else rng
+        offsets = np.arange(self.time_offset + 1, self.time_offset + n + 1, dtype=np.float64)
+        if self.pattern_type == "normal":
+            values = rng.uniform(-self.variance, self.variance, n)
+        elif self.pattern_type == "sinusoidal":
+            values = self.variance * np.sin(offsets * 0.1)
+        elif self.pattern_type == "spike":
+            values = rng.uniform(-self.variance, self.variance, n)
+            spikes = rng.random(n) < 0.05
+            values[spikes] = rng.uniform(self.variance * 2, self.variance * 3, np.count_nonzero(spikes))
+        else:
+            raise ValueError(f"Unknown pattern type: {self.pattern_type}")
+        values += self.base_value
+        if self.trend:
+            values += self.trend * offsets
+        values += rng.uniform(-self.variance * 0.1, self.variance * 0.1, n)
+        self.time_offset += n
+        if n:
+            self.last_value = float(values[-1])
+        return values
+
     def generate_wild_data(self):
         wild_multiplier = random.uniform(5, 15)
         return (self.base_value + self.base_value * wild_multiplier
                 if random.random() < 0.5 else self.base_value - self.base_value * wild_multiplier)
+
+    def generate_wild_batch(self, n, rng=None):
+        rng = self.rng if rng is None else rng
+        offsets = self.base_value * rng.uniform(5, 15, n)
+        return np.where(rng.random(n) < 0.5, self.base_value + offsets, self.base_value - offsets)
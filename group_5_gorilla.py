@@ -0,0 +1,277 @@
+import struct
+import numpy as np
+import group_5_config as config
+
+# Compressed block: format, version, device count, reading count, timestamp unit (ns), then a bit
+# stream: the device table (32 bits per device) followed by every reading in arrival order as a
+# device index, a delta-of-delta timestamp, a packet id delta-of-delta against the same device's
+# previous reading, and the value XORed with that device's previous value
+COMPRESSED_HEADER = struct.Struct("<BBHII")
+COMPRESSED_FORMAT = 0xB3
+COMPRESSED_VERSION = 1
+MAX_DEVICES = 0xFFFF
+
+# Blocks in a file or stream are prefixed with their length
+FRAME_HEADER = struct.Struct("<I")
+
+MASK64 = (1 << 64) - 1
+# Value widths for delta-of-deltas whose prefix has 1 to 5 ones before a zero; six ones mean a
+# raw 64-bit value follows and a lone zero bit means the delta didn't change
+DOD_BITS = (7, 9, 12, 20, 32)
+
+
+class BitWriter:
+    __slots__ = ("buffer", "acc", "bits")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value, width):
+        self.acc = (self.acc << width) | value
+        self.bits += width
+        if self.bits >= 64:
+            spare = self.bits & 7
+            self.buffer += (self.acc >> spare).to_bytes((self.bits - spare) >> 3, "big")
+            self.acc &= (1 << spare) - 1
+            self.bits = spare
+
+    def finish(self):
+        # Pads the last byte with zeros
+        if self.bits:
+            padding = -self.bits & 7
+            self.buffer += (self.acc << padding).to_bytes((self.bits + padding) >> 3, "big")
+            self.acc = 0
+            self.bits = 0
+        return bytes(self.buffer)
+
+
+class BitReader:
+    __slots__ = ("data", "position", "acc", "bits")
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.position = offset
+        self.acc = 0
+        self.bits = 0
+
+    def read(self, width):
+        while self.bits < width:
+            chunk = self.data[self.position:self.position + 8]
+            if not chunk:
+                raise ValueError("Compressed block is truncated")
+            self.acc = (self.acc << (len(chunk) << 3)) | int.from_bytes(chunk, "big")
+            self.bits += len(chunk) << 3
+            self.position += len(chunk)
+        self.bits -= width
+        value = self.acc >> self.bits
+        self.acc &= (1 << self.bits) - 1
+        return value
+
+    @property
+    def remaining_bits(self):
+        return (len(self.data) - self.position) * 8 + self.bits
+
+
+def write_dod(write, dod):
+    if not dod:
+        write(0, 1)
+        return
+    for ones, width in enumerate(DOD_BITS, 1):
+        half = 1 << (width - 1)
+        if -half < dod <= half:
+            prefix = ((1 << ones) - 1) << 1
+            write((prefix << width) | (dod + half - 1), ones + 1 + width)
+            return
+    write((0b111111 << 64) | (dod & MASK64), 70)
+
+
+def read_dod(read):
+    ones = 0
+    while ones < 6 and read(1):
+        ones += 1
+    if not ones:
+        return 0
+    if ones == 6:
+        return read(64)
+    width = DOD_BITS[ones - 1]
+    return read(width) - (1 << (width - 1)) + 1
+
+
+def write_xor(write, xor, window):
+    # window holds the leading and trailing zero counts of the last explicitly sized value
+    if not xor:
+        write(0, 1)
+        return
+    lead = min(64 - xor.bit_length(), 31)
+    trail = (xor & -xor).bit_length() - 1
+    leading, trailing = window
+    if leading >= 0 and lead >= leading and trail >= trailing:
+        # Meaningful bits fit in the previous window
+        width = 64 - leading - trailing
+        write((0b10 << width) | (xor >> trailing), 2 + width)
+    else:
+        window[0], window[1] = lead, trail
+        width = 64 - lead - trail
+        write((((0b11 << 5 | lead) << 6 | (width & 63)) << width) | (xor >> trail), 13 + width)
+
+
+def read_xor(read, window):
+    if not read(1):
+        return 0
+    if read(1):
+        window[0] = read(5)
+        window[1] = 64 - window[0] - (read(6) or 64)
+    return read(64 - window[0] - window[1]) << window[1]
+
+
+def encode_columns(timestamps_ns, devices, packet_ids, values, time_unit_ns=config.COMPRESSED_TIME_UNIT_NS):
+    # Any sequence or array per column; row order is kept. Packet ids and values are predicted
+    # from the same device's previous reading in the block, or a device's first id from zero and
+    # its first value from the previous reading of any device
+    if time_unit_ns < 1:
+        raise ValueError("Time unit must be at least one nanosecond.")
+    times = (np.asarray(timestamps_ns, dtype=np.int64) // time_unit_ns).tolist()
+    devices = np.asarray(devices, dtype=np.int64).tolist()
+    ids = np.asarray(packet_ids, dtype=np.uint64).tolist()
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    table = {}
+    for device in devices:
+        if device not in table:
+            if not 0 <= device <= 0xFFFFFFFF:
+                raise ValueError("Device ids must fit in 32 bits.")
+            table[device] = len(table)
+    if len(table) > MAX_DEVICES:
+        raise ValueError(f"A compressed block cannot hold more than {MAX_DEVICES} devices")
+    writer = BitWriter()
+    write = writer.write
+    for device in table:
+        write(device, 32)
+    index_width = (len(table) - 1).bit_length() if table else 0
+    id_state = [None] * len(table)
+    value_state = [None] * len(table)
+    window = [-1, -1]
+    previous_time = time_delta = previous_value = 0
+    for timestamp, device, packet_id, value in zip(times, devices, ids, bits):
+        index = table[device]
+        if index_width:
+            write(index, index_width)
+        delta = timestamp - previous_time
+        write_dod(write, delta - time_delta)
+        previous_time, time_delta = timestamp, delta
+        state = id_state[index]
+        if state is None:
+            write_dod(write, packet_id)
+            id_state[index] = [packet_id, 0]
+        else:
+            delta = packet_id - state[0]
+            write_dod(write, delta - state[1])
+            state[0], state[1] = packet_id, delta
+        base = value_state[index]
+        write_xor(write, value ^ (previous_value if base is None else base), window)
+        value_state[index] = previous_value = value
+    return (COMPRESSED_HEADER.pack(COMPRESSED_FORMAT, COMPRESSED_VERSION, len(table), len(times), time_unit_ns)
+            + writer.finish())
+
+
+def block_devices(block):
+    # The device table of a block without decoding its readings; ValueError if the block is unusable
+    if len(block) < COMPRESSED_HEADER.size:
+        raise ValueError("Compressed block is truncated")
+    block_format, version, device_count, _, _ = COMPRESSED_HEADER.unpack_from(block)
+    if block_format != COMPRESSED_FORMAT or version != COMPRESSED_VERSION:
+        raise ValueError("Not a compressed block")
+    # The table is the first thing in the bit stream, so it starts on a byte boundary
+    if len(block) < COMPRESSED_HEADER.size + 4 * device_count:
+        raise ValueError("Compressed block is truncated")
+    return np.frombuffer(block, dtype=">u4", count=device_count, offset=COMPRESSED_HEADER.size)
+
+
+def decode_columns(block):
+    # Returns {"timestamp", "device", "packet_id", "value"} NumPy arrays; ValueError if the block is unusable
+    if len(block) < COMPRESSED_HEADER.size:
+        raise ValueError("Compressed block is truncated")
+    block_format, version, device_count, count, time_unit_ns = COMPRESSED_HEADER.unpack_from(block)
+    if block_format != COMPRESSED_FORMAT or version != COMPRESSED_VERSION or not time_unit_ns:
+        raise ValueError("Not a compressed block")
+    reader = BitReader(block, COMPRESSED_HEADER.size)
+    read = reader.read
+    table = [read(32) for _ in range(device_count)]
+    # Every reading takes at least three bits, which bounds what a corrupt count can claim
+    if count * 3 > reader.remaining_bits or (count and not table):
+        raise ValueError("Compressed block is corrupt")
+    index_width = (device_count - 1).bit_length() if device_count else 0
+    times, devices, packet_ids, value_bits = [], [], [], []
+    id_state = [None] * device_count
+    value_state = [None] * device_count
+    window = [0, 0]
+    previous_time = time_delta = previous_value = 0
+    # Sums wrap at 64 bits, which undoes the masking of raw 64-bit deltas
+    for _ in range(count):
+        index = read(index_width) if index_width else 0
+        if index >= device_count:
+            raise ValueError("Compressed block is corrupt")
+        time_delta = (time_delta + read_dod(read)) & MASK64
+        previous_time = (previous_time + time_delta) & MASK64
+        state = id_state[index]
+        if state is None:
+            packet_id = read_dod(read) & MASK64
+            id_state[index] = [packet_id, 0]
+        else:
+            state[1] = (state[1] + read_dod(read)) & MASK64
+            packet_id = state[0] = (state[0] + state[1]) & MASK64
+        base = value_state[index]
+        value = read_xor(read, window) ^ (previous_value if base is None else base)
+        value_state[index] = previous_value = value
+        times.append(previous_time)
+        devices.append(table[index])
+        packet_ids.append(packet_id)
+        value_bits.append(value)
+    return {
+        "timestamp": np.array(times, dtype=np.uint64).view(np.int64) * time_unit_ns,
+        "device": np.array(devices, dtype=np.int64),
+        "packet_id": np.array(packet_ids, dtype=np.uint64),
+        "value": np.array(value_bits, dtype=np.uint64).view(np.float64),
+    }
+
+
+class StreamDecoder:
+    # Incremental decoder for a byte stream of length-prefixed blocks, e.g. a file read in
+    # chunks: feed() returns the column arrays of every block completed so far
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        blocks = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            length, = FRAME_HEADER.unpack_from(self.buffer, offset)
+            end = offset + FRAME_HEADER.size + length
+            if end > len(self.buffer):
+                break
+            blocks.append(decode_columns(bytes(self.buffer[offset + FRAME_HEADER.size:end])))
+            offset = end
+        del self.buffer[:offset]
+        return blocks
+
+    @property
+    def pending(self):
+        return len(self.buffer)
+
+
+def write_frame(file, block):
+    file.write(FRAME_HEADER.pack(len(block)))
+    file.write(block)
+
+
+def read_frames(path, chunk_size=1 << 20):
+    # Yields the column arrays of every complete block in a file of frames
+    decoder = StreamDecoder()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield from decoder.feed(chunk)
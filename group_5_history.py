@@ -0,0 +1,138 @@
+import math
+import numpy as np
+from group_5_ring_buffer import RingBuffer
+import group_5_config as config
+
+SECONDS_PER_DAY = 86400.0
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keep the point of each bucket that forms the largest
+    # triangle with the previously kept point and the average of the next bucket
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0] = 0
+    keep[-1] = n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+
+class RollupTier:
+    def __init__(self, bucket_seconds, capacity):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_days = bucket_seconds / SECONDS_PER_DAY
+        self.capacity = capacity
+        self.means = RingBuffer(capacity)
+        self.mins = RingBuffer(capacity)
+        self.maxs = RingBuffer(capacity)
+        self.bucket = None
+        self.reset_bucket()
+
+    @property
+    def coverage_seconds(self):
+        return self.bucket_seconds * self.capacity
+
+    def reset_bucket(self):
+        self.bucket = None
+        self.bucket_min = math.inf
+        self.bucket_max = -math.inf
+        self.bucket_sum = 0.0
+        self.bucket_count = 0
+
+    def add(self, timestamp, value):
+        bucket = math.floor(timestamp / self.bucket_days)
+        # Late readings are folded into the open bucket rather than rewriting closed ones
+        if self.bucket is not None and bucket > self.bucket:
+            self.close_bucket()
+        if self.bucket is None:
+            self.bucket = bucket
+        if value < self.bucket_min:
+            self.bucket_min = value
+        if value > self.bucket_max:
+            self.bucket_max = value
+        self.bucket_sum += value
+        self.bucket_count += 1
+
+    def close_bucket(self):
+        if self.bucket_count:
+            middle = (self.bucket + 0.5) * self.bucket_days
+            self.means.append(middle, self.bucket_sum / self.bucket_count)
+            self.mins.append(middle, self.bucket_min)
+            self.maxs.append(middle, self.bucket_max)
+        self.reset_bucket()
+
+    def clear(self):
+        for buffer in (self.means, self.mins, self.maxs):
+            buffer.clear()
+        self.reset_bucket()
+
+
+class TieredHistory:
+    def __init__(self, raw_capacity, tiers=config.HISTORY_TIERS):
+        self.raw = RingBuffer(raw_capacity)
+        self.tiers = [RollupTier(bucket_seconds, capacity) for bucket_seconds, capacity in tiers]
+
+    def __len__(self):
+        return len(self.raw)
+
+    def append(self, timestamp, value):
+        self.raw.append(timestamp, value)
+        if not math.isnan(value):
+            for tier in self.tiers:
+                tier.add(timestamp, value)
+
+    def clear(self):
+        self.raw.clear()
+        for tier in self.tiers:
+            tier.clear()
+
+    def view(self, window_seconds, max_points):
+        # Returns (timestamps, values, min_value, max_value) for the newest window_seconds,
+        # decimated to max_points, or None when there is nothing to plot
+        raw = self.raw
+        if raw.min_value is None:
+            return None
+        if not window_seconds:
+            x, y = raw.timestamps(), raw.values()
+            finite = ~np.isnan(y)
+            x, y = lttb(x[finite], y[finite], max_points)
+            return x, y, raw.min_value, raw.max_value
+        start = raw.max_time - window_seconds / SECONDS_PER_DAY
+        if raw.min_time <= start or not self.tiers:
+            x, y = raw.timestamps(), raw.values()
+            selected = (x >= start) & ~np.isnan(y)
+            x, y = x[selected], y[selected]
+            if not len(x):
+                return None
+            low, high = y.min(), y.max()
+            x, y = lttb(x, y, max_points)
+            return x, y, low, high
+        tier = next((t for t in self.tiers if t.coverage_seconds >= window_seconds), self.tiers[-1])
+        x = tier.means.timestamps()
+        selected = x >= start
+        x = x[selected]
+        y = tier.means.values()[selected]
+        low = tier.mins.values()[selected].min(initial=math.inf)
+        high = tier.maxs.values()[selected].max(initial=-math.inf)
+        if tier.bucket_count:
+            # Include the still-open bucket so the newest readings show up immediately
+            x = np.append(x, (tier.bucket + 0.5) * tier.bucket_days)
+            y = np.append(y, tier.bucket_sum / tier.bucket_count)
+            low = min(low, tier.bucket_min)
+            high = max(high, tier.bucket_max)
+        if not len(x):
+            return None
+        x, y = lttb(x, y, max_points)
+        return x, y, low, high
@@ -0,0 +1,165 @@
+import threading
+import time
+from group_5_metrics import Histogram
+import group_5_config as config
+
+
+class InflightMessage:
+    __slots__ = ("sent", "payload", "count", "attempts")
+
+    def __init__(self, sent, payload, count, attempts):
+        self.sent = sent
+        self.payload = payload
+        self.count = count
+        self.attempts = attempts
+
+
+class InflightWindow:
+    # Tracks QoS 1/2 publishes until paho reports their ack through on_publish, caps how many
+    # may be unacknowledged at once and sets the send rate with additive increase /
+    # multiplicative decrease: back off when the window fills or acks time out, speed up
+    # while acks come back fast
+    def __init__(self, max_inflight=config.MAX_INFLIGHT, ack_timeout=config.ACK_TIMEOUT,
+                 max_retries=config.ACK_MAX_RETRIES, control_interval=config.RATE_CONTROL_INTERVAL,
+                 increase=config.RATE_INCREASE, decrease=config.RATE_DECREASE,
+                 fast_ack=config.ACK_FAST_SECONDS, max_scale=config.RATE_MAX_SCALE, min_scale=0.01):
+        if max_inflight <= 0:
+            raise ValueError("The in-flight window must hold at least one message.")
+        self.max_inflight = max_inflight
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.control_interval = control_interval
+        self.increase = increase
+        self.decrease = decrease
+        self.fast_ack = fast_ack
+        self.max_scale = max_scale
+        self.min_scale = min_scale
+        self.condition = threading.Condition()
+        self.messages = {}
+        # paho can report an ack before publish() has returned its mid to us
+        self.early_acks = set()
+        # Timed-out mids whose late ack must not be mistaken for an early one
+        self.abandoned = set()
+        # Slots taken by acquire() whose publish has not reached sent() or release() yet
+        self.reserved = 0
+        self.next_scan = 0.0
+        self.ack_seconds = Histogram("ack_seconds", "Publish to broker acknowledgement latency")
+        self.acked = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.lost = 0
+        self.window_full = 0
+        self.scale = min(1.0, max_scale)
+        self.interval_started = time.monotonic()
+        self.interval_acks = 0
+        self.interval_ack_seconds = 0.0
+        self.interval_congested = False
+
+    def __len__(self):
+        return len(self.messages) + self.reserved
+
+    @property
+    def pace(self):
+        # Multiplier for the publish schedule: above 1 while the controller holds the rate back
+        return 1.0 / self.scale
+
+    def acquire(self, timeout):
+        # Waits for a free slot and reserves it; False if none opened within timeout. Every
+        # True must be followed by sent() or, if the publish failed, release()
+        with self.condition:
+            if len(self) >= self.max_inflight:
+                self.window_full += 1
+                self.interval_congested = True
+                if not self.condition.wait_for(lambda: len(self) < self.max_inflight, timeout):
+                    return False
+            self.reserved += 1
+            return True
+
+    def release(self):
+        # Gives back a reserved slot whose publish did not go out
+        with self.condition:
+            self.reserved = max(0, self.reserved - 1)
+            self.condition.notify()
+
+    def sent(self, mid, payload, count, attempts=0):
+        now = time.monotonic()
+        with self.condition:
+            self.reserved = max(0, self.reserved - 1)
+            # paho reuses mids, so an old timeout must not swallow this message's ack
+            self.abandoned.discard(mid)
+            if mid in self.early_acks:
+                self.early_acks.discard(mid)
+                self.record_ack(0.0)
+                self.condition.notify()
+                return
+            self.messages[mid] = InflightMessage(now, payload, count, attempts)
+
+    def on_publish(self, client, userdata, mid):
+        # paho network thread
+        now = time.monotonic()
+        with self.condition:
+            message = self.messages.pop(mid, None)
+            if message is None:
+                if mid in self.abandoned:
+                    self.abandoned.discard(mid)
+                else:
+                    self.early_acks.add(mid)
+                return
+            self.record_ack(now - message.sent)
+            self.condition.notify()
+
+    def record_ack(self, seconds):
+        self.acked += 1
+        self.ack_seconds.observe(seconds)
+        self.interval_acks += 1
+        self.interval_ack_seconds += seconds
+
+    def take_expired(self):
+        # Messages past the ack timeout: returns (payload, count, attempts) to resend and
+        # gives up on the ones out of retries
+        now = time.monotonic()
+        resend = []
+        if now < self.next_scan:
+            return resend
+        self.next_scan = now + self.ack_timeout / 10
+        with self.condition:
+            expired = [mid for mid, message in self.messages.items() if now - message.sent >= self.ack_timeout]
+            for mid in expired:
+                message = self.messages.pop(mid)
+                self.abandoned.add(mid)
+                self.timeouts += 1
+                self.interval_congested = True
+                if message.attempts < self.max_retries:
+                    self.retries += 1
+                    resend.append((message.payload, message.count, message.attempts + 1))
+                else:
+                    self.lost += message.count
+            if expired:
+                self.condition.notify_all()
+        return resend
+
+    def adjust(self):
+        # Called often from the publishing threads; acts once per control interval
+        now = time.monotonic()
+        if now - self.interval_started < self.control_interval:
+            return False
+        with self.condition:
+            if now - self.interval_started < self.control_interval:
+                return False
+            if self.interval_congested:
+                self.scale = max(self.min_scale, self.scale * self.decrease)
+            elif self.interval_acks and self.interval_ack_seconds / self.interval_acks < self.fast_ack:
+                self.scale = min(self.max_scale, self.scale + self.increase)
+            self.interval_started = now
+            self.interval_acks = 0
+            self.interval_ack_seconds = 0.0
+            self.interval_congested = False
+        return True
+
+    def clear(self):
+        with self.condition:
+            self.messages.clear()
+            self.early_acks.clear()
+            self.abandoned.clear()
+            self.reserved = 0
+            self.condition.notify_all()
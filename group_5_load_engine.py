@@ -0,0 +1,550 @@
+import argparse
+import random
+import threading
+import time
+import paho.mqtt.client as mqtt
+from group_5_data_generator import DataGenerator
+from group_5_mqtt_utils import MQTTUtils, PacketBuilder, ENVELOPE_MAX_READINGS, ENVELOPE_RECORD
+from group_5_metrics import MetricsRegistry, MetricsServer, Histogram
+from group_5_inflight import InflightWindow
+from group_5_scheduler import DeadlineScheduler, POLICIES
+from group_5_async_mqtt import ConnectionPool, parse_brokers
+from group_5_spool import Spool
+import group_5_config as config
+
+PATTERNS = ["normal", "sinusoidal", "spike"]
+WIRE_FORMATS = ["json", "binary", "compressed"]
+# Seconds between flow control adjustments and ack timeout checks
+WINDOW_MAINTENANCE_INTERVAL = 0.05
+
+
+class SimulatedDevice:
+    __slots__ = ("device_id", "generator", "interval", "builder")
+
+    def __init__(self, device_id, generator, rate):
+        self.device_id = device_id
+        self.generator = generator
+        self.interval = 1.0 / rate
+        self.builder = PacketBuilder(device_id)
+
+
+class WorkerStats:
+    __slots__ = ("published", "messages", "dropped", "failed", "skipped", "wild", "spooled")
+
+    def __init__(self):
+        self.published = 0
+        self.messages = 0
+        self.dropped = 0
+        self.failed = 0
+        self.skipped = 0
+        self.wild = 0
+        self.spooled = 0
+
+
+def build_devices(count, target_rate, rate_spread=config.LOAD_RATE_SPREAD,
+                  base_value=config.EXPECTED_BASE, variance=10, patterns=PATTERNS,
+                  first_device_id=config.LOAD_FIRST_DEVICE_ID):
+    if count <= 0 or target_rate <= 0:
+        raise ValueError("Device count and target rate must be positive.")
+    if not 0 <= rate_spread < 1:
+        raise ValueError("Rate spread must be in [0, 1).")
+    weights = [random.uniform(1 - rate_spread, 1 + rate_spread) for _ in range(count)]
+    scale = target_rate / sum(weights)
+    return [SimulatedDevice(first_device_id + i, DataGenerator(base_value, variance, 0, patterns[i % len(patterns)]),
+                            w * scale) for i, w in enumerate(weights)]
+
+
+class LoadEngine:
+    def __init__(self, client, topic, devices, workers=config.LOAD_WORKERS, log=None,
+                 verbose=False, on_stopped=None, wire_format=config.WIRE_FORMAT,
+                 batch_size=config.BATCH_MAX_READINGS, batch_delay_ms=config.BATCH_MAX_DELAY_MS,
+                 qos=config.PUBLISH_QOS, max_inflight=config.MAX_INFLIGHT,
+                 schedule_policy=config.SCHEDULER_POLICY, spool=None, drain_batch=config.SPOOL_DRAIN_BATCH,
+                 drain_max_rate=config.SPOOL_DRAIN_MAX_RATE, drain_window_share=config.SPOOL_DRAIN_WINDOW_SHARE):
+        if not devices:
+            raise ValueError("At least one device is required.")
+        self.client = client
+        # A pool routes each device to one of its connections and reconnects on its own
+        self.pooled = isinstance(client, ConnectionPool)
+        self.topic = topic
+        self.devices = devices
+        self.worker_count = max(1, min(workers, len(devices)))
+        self.log = log or (lambda message: None)
+        self.verbose = verbose
+        self.on_stopped = on_stopped
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.binary = wire_format == "binary"
+        self.compressed = wire_format == "compressed"
+        # A lone reading gains nothing from compression, so unbatched compressed traffic goes out as binary
+        self.package = PacketBuilder.json if wire_format == "json" else PacketBuilder.binary
+        if not 1 <= batch_size <= ENVELOPE_MAX_READINGS:
+            raise ValueError(f"Batch size must be between 1 and {ENVELOPE_MAX_READINGS}.")
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay_ms / 1000.0
+        if qos not in (0, 1, 2):
+            raise ValueError(f"Unknown QoS level: {qos}")
+        self.qos = qos
+        self.window = None
+        if qos:
+            self.window = InflightWindow(max_inflight)
+            # Let our window, not paho's default of 20, decide what is in flight
+            client.max_inflight_messages_set(max_inflight)
+        if schedule_policy not in POLICIES:
+            raise ValueError(f"Unknown scheduler policy: {schedule_policy}")
+        self.schedule_policy = schedule_policy
+        self.schedule_jitter = Histogram("schedule_jitter_seconds", "How late publishes ran against their deadline")
+        self.schedulers = []
+        # Readings that can't go out are kept here and drained on a thread of their own once
+        # the connection is back, next to the live traffic
+        self.spool = spool
+        if not 1 <= drain_batch <= ENVELOPE_MAX_READINGS:
+            raise ValueError(f"Drain batch must be between 1 and {ENVELOPE_MAX_READINGS}.")
+        self.drain_batch = drain_batch
+        if drain_max_rate <= 0:
+            raise ValueError("Drain rate must be positive.")
+        if not 0 < drain_window_share <= 1:
+            raise ValueError("Drain window share must be in (0, 1].")
+        self.drain_max_rate = drain_max_rate
+        self.drain_window_share = drain_window_share
+        self.drain_rate = 0.0
+        self.publish_seconds = None
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.worker_stats = []
+        self.active_workers = 0
+        self.lock = threading.Lock()
+        self.started_at = None
+
+    @property
+    def running(self):
+        return bool(self.threads) and not self.stop_event.is_set()
+
+    def target_rate(self):
+        return sum(1.0 / d.interval for d in self.devices)
+
+    def start(self):
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.worker_stats = [WorkerStats() for _ in range(self.worker_count)]
+        self.active_workers = self.worker_count
+        self.started_at = time.monotonic()
+        self.threads = []
+        self.schedulers = [DeadlineScheduler(self.schedule_policy, jitter=self.schedule_jitter)
+                           for _ in range(self.worker_count)]
+        for i in range(self.worker_count):
+            shard = self.devices[i::self.worker_count]
+            thread = threading.Thread(target=self.run_worker, args=(shard, self.worker_stats[i], self.schedulers[i]),
+                                      name=f"load-worker-{i}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        if self.spool is not None:
+            thread = threading.Thread(target=self.run_drain, name="spool-drain", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout=1.5):
+        self.stop_event.set()
+        current = threading.current_thread()
+        for thread in self.threads:
+            if thread is not current and thread.is_alive():
+                thread.join(timeout=timeout)
+
+    def on_publish(self, client, userdata, mid):
+        if self.window is not None:
+            self.window.on_publish(client, userdata, mid)
+
+    def total(self, field):
+        return sum(getattr(stats, field) for stats in self.worker_stats)
+
+    def register_metrics(self, registry):
+        # Counters are read from the per-worker stats at scrape time, nothing extra on the hot path
+        for field, help_text in (("published", "Readings published"),
+                                 ("messages", "MQTT messages published"),
+                                 ("dropped", "Readings dropped by the packet loss simulation"),
+                                 ("failed", "Readings that failed to publish"),
+                                 ("skipped", "Simulated block skips"),
+                                 ("wild", "Wild readings generated"),
+                                 ("spooled", "Readings written to the offline spool while disconnected")):
+            registry.counter(f"{field}_total", help_text, lambda field=field: self.total(field))
+        registry.gauge("devices", "Simulated devices", lambda: len(self.devices))
+        registry.gauge("target_rate", "Target aggregate readings per second", self.target_rate)
+        registry.gauge("running", "1 while the engine is publishing", lambda: int(self.running))
+        registry.counter("deadlines_skipped_total", "Publishes skipped to get back on schedule",
+                         lambda: sum(scheduler.skipped for scheduler in self.schedulers))
+        registry.add(self.schedule_jitter)
+        spool = self.spool
+        if spool is not None:
+            registry.counter("spool_drained_total", "Spooled readings published after reconnecting",
+                             lambda: spool.drained)
+            registry.counter("spool_overflow_total", "Spooled readings dropped because the spool was full",
+                             lambda: spool.overflowed)
+            registry.gauge("spool_backlog", "Readings waiting in the offline spool", lambda: spool.backlog)
+            registry.gauge("spool_backlog_bytes", "Bytes waiting in the offline spool", lambda: spool.backlog_bytes)
+            registry.gauge("spool_drain_rate", "Spooled readings published per second", lambda: self.drain_rate)
+        if self.pooled:
+            pool = self.client
+            registry.gauge("connections_up", "Pooled broker connections currently connected", lambda: pool.connected)
+            registry.counter("reconnects_total", "Pooled connections re-established after a loss",
+                             lambda: pool.reconnects)
+            registry.counter("connect_failures_total", "Failed or refused connection attempts", lambda: pool.failures)
+        self.publish_seconds = registry.histogram("publish_seconds", "Time spent in client.publish")
+        window = self.window
+        if window is not None:
+            registry.counter("acks_total", "QoS 1/2 messages acknowledged by the broker", lambda: window.acked)
+            registry.counter("ack_retries_total", "Messages sent again after an ack timeout", lambda: window.retries)
+            registry.counter("ack_timeouts_total", "Messages not acknowledged within ACK_TIMEOUT",
+                             lambda: window.timeouts)
+            registry.counter("ack_lost_total", "Readings given up on after ACK_MAX_RETRIES", lambda: window.lost)
+            registry.counter("window_full_total", "Times a send found the in-flight window full",
+                             lambda: window.window_full)
+            registry.gauge("inflight", "Messages awaiting an ack", lambda: len(window))
+            registry.gauge("rate_scale", "Adaptive rate as a fraction of the target rate", lambda: window.scale)
+            registry.add(window.ack_seconds)
+
+    def stats(self):
+        totals = WorkerStats()
+        for stats in self.worker_stats:
+            for field in WorkerStats.__slots__:
+                setattr(totals, field, getattr(totals, field) + getattr(stats, field))
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        result = {field: getattr(totals, field) for field in WorkerStats.__slots__}
+        result["elapsed"] = elapsed
+        result["rate"] = totals.published / elapsed if elapsed > 0 else 0.0
+        result["deadlines_skipped"] = sum(scheduler.skipped for scheduler in self.schedulers)
+        result["jitter_p50"] = self.schedule_jitter.quantile(0.5)
+        result["jitter_p99"] = self.schedule_jitter.quantile(0.99)
+        spool = self.spool
+        if spool is not None:
+            result.update(backlog=spool.backlog, backlog_bytes=spool.backlog_bytes, drained=spool.drained,
+                          drain_rate=self.drain_rate, spool_overflow=spool.overflowed)
+        if self.pooled:
+            result.update(connections=self.client.connected, reconnects=self.client.reconnects)
+        window = self.window
+        if window is not None:
+            result.update(inflight=len(window), acked=window.acked, retries=window.retries,
+                          timeouts=window.timeouts, lost=window.lost, rate_scale=window.scale,
+                          ack_p50=window.ack_seconds.quantile(0.5))
+        return result
+
+    def run_worker(self, shard, stats, scheduler):
+        batch = []
+        flush_timer = None
+        window = self.window
+
+        def flush_batch():
+            nonlocal flush_timer
+            flush_timer = None
+            if batch:
+                self.flush(batch, stats)
+
+        def publish(device):
+            nonlocal flush_timer
+            pending = len(batch)
+            try:
+                delay = self.tick(device, stats, batch)
+            except Exception as e:
+                self.log(f"Publishing loop error: {e}")
+                if not self.pooled and self.spool is None and not self.client.is_connected():
+                    self.log("Client disconnected. Stopping publish loop.")
+                    self.stop_event.set()
+                delay = 2
+            if batch and not pending:
+                flush_timer = scheduler.call_later(self.batch_delay, flush_batch)
+            elif not batch and flush_timer is not None:
+                scheduler.cancel(flush_timer)
+                flush_timer = None
+            return delay
+
+        def maintain_window():
+            window.adjust()
+            scheduler.pace = window.pace
+            for payload, count, attempts in window.take_expired():
+                self.send(payload, count, "retry", f"Resent unacknowledged message (attempt {attempts})",
+                          stats, attempts)
+
+        now = time.monotonic()
+        for device in shard:
+            # Stagger first publishes so devices sharing a rate don't fire in lockstep
+            scheduler.add(lambda device=device: publish(device), device.interval,
+                          first_due=now + random.uniform(0, device.interval), paced=True)
+        if window is not None:
+            scheduler.add(maintain_window, WINDOW_MAINTENANCE_INTERVAL)
+        try:
+            scheduler.run(self.stop_event)
+        finally:
+            if batch:
+                try:
+                    self.flush(batch, stats)
+                except Exception as e:
+                    self.log(f"Failed to flush pending readings: {e}")
+            with self.lock:
+                self.active_workers -= 1
+                last = self.active_workers == 0
+            if last:
+                self.log("Publishing loop finished.")
+                if self.on_stopped:
+                    self.on_stopped(self)
+
+    def tick(self, device, stats, batch):
+        if MQTTUtils.should_skip_block():
+            skip_duration = random.uniform(2, 5)
+            stats.skipped += 1
+            if self.verbose:
+                self.log(f"Simulating block skip for {skip_duration:.1f}s...")
+            # Restarts this device's schedule after the outage
+            return skip_duration
+        if random.random() < config.WILD_DATA_CHANCE:
+            value = device.generator.generate_wild_data()
+            stats.wild += 1
+            log_prefix = "[WILD DATA] "
+        else:
+            value = device.generator.generate()
+            log_prefix = ""
+        builder = device.builder
+        packet_id = builder.next_id()
+        if MQTTUtils.should_drop_packet():
+            stats.dropped += 1
+            if self.verbose:
+                self.log(f"{log_prefix}Simulating packet drop (ID: {packet_id})")
+            return None
+        if self.spool is not None and not self.can_publish(device.device_id):
+            self.spool.append(builder.reading(value, packet_id))
+            stats.spooled += 1
+            if self.verbose:
+                self.log(f"{log_prefix}Spooled (ID: {packet_id}) while disconnected")
+            return None
+        if self.batch_size > 1:
+            batch.append(builder.reading(value, packet_id))
+            if self.verbose:
+                self.log(f"{log_prefix}Queued (ID: {packet_id}): {value:.2f}")
+            if len(batch) >= self.batch_size:
+                self.flush(batch, stats)
+            return None
+        payload = self.package(builder, value, packet_id)
+        self.send(payload, 1, f"(ID: {packet_id})", f"{log_prefix}Published (ID: {packet_id}): {value:.2f}", stats,
+                  key=device.device_id)
+        return None
+
+    def flush(self, batch, stats):
+        if self.spool is not None and not self.can_publish(None):
+            self.spool.extend(batch)
+            stats.spooled += len(batch)
+            batch.clear()
+            return
+        if self.compressed:
+            payload = MQTTUtils.package_compressed(batch)
+        else:
+            payload = MQTTUtils.package_envelope(batch, binary=self.binary)
+        label = f"envelope (IDs {batch[0][0]}-{batch[-1][0]})"
+        count = len(batch)
+        batch.clear()
+        self.send(payload, count, label, f"Published {label} with {count} readings", stats)
+
+    def can_publish(self, key):
+        if self.pooled:
+            return self.client.can_publish(key)
+        # paho still reports connected for a moment after it has dropped a broken socket
+        return self.client.is_connected() and self.client.socket() is not None
+
+    def run_drain(self):
+        # Sends the spool oldest first in envelopes while connected. The pace is capped by
+        # drain_max_rate, scaled by the adaptive rate at QoS 1/2, and the drain only fills its
+        # share of the in-flight window so live readings still get slots
+        spool = self.spool
+        window = self.window
+        wait = self.stop_event.wait
+        allowance = 0.0
+        last = time.monotonic()
+        rate_started, rate_drained = last, spool.drained
+        next_flush = last + config.SPOOL_FLUSH_INTERVAL
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_flush:
+                spool.flush()
+                next_flush = now + config.SPOOL_FLUSH_INTERVAL
+            if now - rate_started >= 1.0:
+                self.drain_rate = (spool.drained - rate_drained) / (now - rate_started)
+                rate_started, rate_drained = now, spool.drained
+            rate = self.drain_max_rate * (window.scale if window is not None else 1.0)
+            allowance = min(allowance + (now - last) * rate, self.drain_batch)
+            last = now
+            if not spool.backlog or not self.can_publish(None):
+                allowance = 0.0
+                wait(0.1)
+                continue
+            if window is not None and len(window) >= window.max_inflight * self.drain_window_share:
+                wait(0.005)
+                continue
+            if allowance < self.drain_batch and allowance < spool.backlog:
+                wait((min(self.drain_batch, spool.backlog) - allowance) / rate if rate > 0 else 0.1)
+                continue
+            # Same in-flight limit as live publishes; the share check above only keeps room for them
+            if window is not None and not window.acquire(0.1):
+                continue
+            records, token = spool.peek(int(allowance))
+            if not records:
+                if window is not None:
+                    window.release()
+                continue
+            if self.compressed or not self.binary:
+                readings = list(ENVELOPE_RECORD.iter_unpack(records))
+                payload = MQTTUtils.package_compressed(readings) if self.compressed \
+                    else MQTTUtils.package_envelope(readings)
+            else:
+                payload = MQTTUtils.package_envelope_records(records)
+            count = len(records) // ENVELOPE_RECORD.size
+            result, mid = self.client.publish(self.topic, payload, qos=self.qos)
+            if result != mqtt.MQTT_ERR_SUCCESS:
+                # Still spooled; try again once the connection is back
+                if window is not None:
+                    window.release()
+                wait(0.1)
+                continue
+            allowance -= count
+            spool.commit(count, token)
+            if window is not None:
+                window.sent(mid, payload, count)
+            if self.verbose:
+                self.log(f"Drained {count} spooled readings, {spool.backlog} left")
+        spool.flush()
+
+    def send(self, payload, count, label, success_message, stats, attempts=0, key=None):
+        # key picks the pool connection; envelopes and retries without one stay on the worker's connection
+        window = self.window
+        if window is not None:
+            while not window.acquire(0.1):
+                if self.stop_event.is_set():
+                    stats.failed += count
+                    return
+        started = time.perf_counter()
+        if self.pooled:
+            result, mid = self.client.publish(self.topic, payload, qos=self.qos, key=key)
+        else:
+            result, mid = self.client.publish(self.topic, payload, qos=self.qos)
+        if self.publish_seconds:
+            self.publish_seconds.observe(time.perf_counter() - started)
+        if result == mqtt.MQTT_ERR_SUCCESS:
+            if window is not None:
+                window.sent(mid, payload, count, attempts)
+            if not attempts:
+                stats.published += count
+                stats.messages += 1
+            if self.verbose:
+                self.log(success_message)
+        else:
+            if window is not None:
+                window.release()
+            stats.failed += count
+            if self.verbose:
+                self.log(f"Failed to publish {label}. Error code: {result}")
+            if result == mqtt.MQTT_ERR_NO_CONN and not self.pooled and self.spool is None:
+                self.log("Disconnected during publish. Stopping.")
+                self.stop_event.set()
+
+
+def format_stats(stats):
+    return (f"t={stats['elapsed']:.1f}s published={stats['published']} rate={stats['rate']:.1f}/s "
+            f"messages={stats['messages']} "
+            f"dropped={stats['dropped']} failed={stats['failed']} skipped={stats['skipped']} wild={stats['wild']} "
+            f"jitter_p50={stats['jitter_p50'] * 1000:.2f}ms jitter_p99={stats['jitter_p99'] * 1000:.2f}ms "
+            f"deadlines_skipped={stats['deadlines_skipped']}"
+            + (f" inflight={stats['inflight']} acked={stats['acked']} retries={stats['retries']} "
+               f"lost={stats['lost']} ack_p50={stats['ack_p50'] * 1000:.1f}ms rate_scale={stats['rate_scale']:.2f}"
+               if "inflight" in stats else "")
+            + (f" connections={stats['connections']} reconnects={stats['reconnects']}"
+               if "connections" in stats else "")
+            + (f" spooled={stats['spooled']} backlog={stats['backlog']} ({stats['backlog_bytes'] / 1e6:.1f} MB) "
+               f"drained={stats['drained']} drain_rate={stats['drain_rate']:.0f}/s overflow={stats['spool_overflow']}"
+               if "backlog" in stats else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless multi-device MQTT load generator")
+    parser.add_argument("--broker", default=config.MQTT_BROKER_URL)
+    parser.add_argument("--port", type=int, default=int(config.MQTT_BROKER_PORT))
+    parser.add_argument("--topic", default=config.MQTT_TOPIC)
+    parser.add_argument("--brokers", default=config.MQTT_BROKERS,
+                        help="comma-separated host:port list served by an asyncio connection pool")
+    parser.add_argument("--connections", type=int, default=config.POOL_CONNECTIONS_PER_BROKER,
+                        help="pooled connections per broker, devices are spread across them")
+    parser.add_argument("--devices", type=int, default=config.LOAD_DEVICE_COUNT)
+    parser.add_argument("--first-device-id", type=int, default=config.LOAD_FIRST_DEVICE_ID,
+                        help="numeric id of the first simulated device, ids are consecutive")
+    parser.add_argument("--rate", type=float, default=config.LOAD_TARGET_RATE,
+                        help="target aggregate messages per second")
+    parser.add_argument("--rate-spread", type=float, default=config.LOAD_RATE_SPREAD)
+    parser.add_argument("--format", choices=WIRE_FORMATS, default=config.WIRE_FORMAT)
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_MAX_READINGS,
+                        help="readings per envelope, 1 disables batching")
+    parser.add_argument("--batch-delay-ms", type=float, default=config.BATCH_MAX_DELAY_MS,
+                        help="longest a reading waits for its envelope to fill")
+    parser.add_argument("--qos", type=int, choices=[0, 1, 2], default=config.PUBLISH_QOS)
+    parser.add_argument("--max-inflight", type=int, default=config.MAX_INFLIGHT,
+                        help="unacknowledged QoS 1/2 messages allowed at once")
+    parser.add_argument("--workers", type=int, default=config.LOAD_WORKERS,
+                        help="publishing threads, each multiplexes its share of the devices")
+    parser.add_argument("--schedule-policy", choices=POLICIES, default=config.SCHEDULER_POLICY,
+                        help="catch_up replays missed publishes after a stall, skip drops them")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 runs until Ctrl-C")
+    parser.add_argument("--report-interval", type=float, default=config.LOAD_REPORT_INTERVAL)
+    parser.add_argument("--metrics-port", type=int, default=config.METRICS_PUBLISHER_PORT,
+                        help="serve Prometheus metrics on this port, 0 disables")
+    parser.add_argument("--spool", default=config.SPOOL_DIRECTORY if config.SPOOL_ENABLED else None,
+                        metavar="DIRECTORY", help="keep readings here while disconnected and send them on reconnect")
+    parser.add_argument("--metrics-snapshot", default=config.METRICS_PUBLISHER_SNAPSHOT,
+                        help="JSON file rewritten with a metrics snapshot every interval")
+    args = parser.parse_args(argv)
+
+    devices = build_devices(args.devices, args.rate, args.rate_spread, first_device_id=args.first_device_id)
+    brokers = parse_brokers(args.brokers, args.port) if args.brokers else [(args.broker, args.port)]
+    pooled = len(brokers) > 1 or args.connections > 1
+    client = ConnectionPool(brokers, args.connections, log=lambda message, level: print(message)) \
+        if pooled else mqtt.Client()
+    spool = Spool(args.spool) if args.spool else None
+    if spool is not None and spool.backlog:
+        print(f"Spool holds {spool.backlog} readings from an earlier run, sending them alongside live data")
+    engine = LoadEngine(client, args.topic, devices, workers=args.workers, log=print,
+                        wire_format=args.format, batch_size=args.batch_size,
+                        batch_delay_ms=args.batch_delay_ms, qos=args.qos, max_inflight=args.max_inflight,
+                        schedule_policy=args.schedule_policy, spool=spool)
+    client.on_publish = engine.on_publish
+    if pooled:
+        if not client.start(timeout=10):
+            print(f"Only {client.connected} of {len(client)} connections are up, the rest keep retrying")
+    else:
+        client.connect(args.broker, args.port, 60)
+        client.loop_start()
+    metrics = MetricsRegistry("publisher")
+    engine.register_metrics(metrics)
+    metrics_server = MetricsServer(metrics, args.metrics_port, args.metrics_snapshot)
+    try:
+        metrics_server.start()
+    except OSError as e:
+        print(f"Metrics endpoint unavailable: {e}")
+    print(f"Publishing {len(devices)} devices to '{args.topic}' at {engine.target_rate():.1f} msgs/sec "
+          f"with {engine.worker_count} workers")
+    engine.start()
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    try:
+        while engine.running and (deadline is None or time.monotonic() < deadline):
+            time.sleep(args.report_interval)
+            print(format_stats(engine.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        metrics_server.stop()
+        if pooled:
+            client.stop()
+        else:
+            client.loop_stop()
+            client.disconnect()
+        if spool is not None:
+            spool.close()
+    print(format_stats(engine.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from collections import deque
+from datetime import datetime
+import re
+import threading
+import time
+import group_5_config as config
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LEVEL_PREFIXES = {"warning": "[WARN] ", "error": "[ERROR] "}
+# Messages that differ only in their numbers count as similar
+NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+
+
+class LogView:
+    # Bounded log model behind a tk.Text. log() may be called from any thread; lines are
+    # rendered in batches on the Tk thread and the widget keeps only the newest max_lines
+    def __init__(self, root, text, max_lines=config.LOG_MAX_LINES, level=config.LOG_LEVEL,
+                 coalesce_seconds=config.LOG_COALESCE_SECONDS, flush_ms=config.LOG_FLUSH_INTERVAL_MS,
+                 timestamps=True):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level: {level}")
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self.min_level = LEVELS[level]
+        self.coalesce_seconds = coalesce_seconds
+        self.flush_ms = flush_ms
+        self.timestamps = timestamps
+        self.entries = deque(maxlen=max_lines)
+        self.pending = deque(maxlen=max_lines)
+        self.groups = {}
+        self.suppressed = 0
+        self.lock = threading.Lock()
+        self.flush_job = None
+
+    def start(self):
+        self.flush_job = self.root.after(self.flush_ms, self.run_flush)
+
+    def stop(self):
+        if self.flush_job is not None:
+            self.root.after_cancel(self.flush_job)
+            self.flush_job = None
+        self.flush()
+
+    def run_flush(self):
+        try:
+            self.flush()
+        finally:
+            self.flush_job = self.root.after(self.flush_ms, self.run_flush)
+
+    def format(self, level, message):
+        prefix = f"[{datetime.now().strftime('%H:%M:%S')}] " if self.timestamps else ""
+        return f"{prefix}{LEVEL_PREFIXES.get(level, '')}{message}\n"
+
+    def log(self, message, level="info"):
+        level_number = LEVELS.get(level, LEVELS["info"])
+        if not self.coalesce_seconds:
+            self.pending.append((level_number, self.format(level, message)))
+            return
+        now = time.monotonic()
+        key = (level, NUMBERS.sub("#", message))
+        with self.lock:
+            group = self.groups.get(key)
+            if group is not None and now - group[0] < self.coalesce_seconds:
+                # Shown once per window; the rest become one "x N similar" line when it closes
+                group[1] += 1
+                group[2] = message
+                self.suppressed += 1
+                return
+            if group is not None and group[1]:
+                self.pending.append(self.summary(level, group))
+            self.groups[key] = [now, 0, None]
+            self.pending.append((level_number, self.format(level, message)))
+
+    def write(self, text, level="info"):
+        # Preformatted text, never coalesced
+        self.pending.append((LEVELS.get(level, LEVELS["info"]), text))
+
+    def summary(self, level, group):
+        return LEVELS.get(level, LEVELS["info"]), self.format(level, f"{group[2]} (x {group[1]} similar)")
+
+    def expire_groups(self):
+        now = time.monotonic()
+        with self.lock:
+            for key, group in list(self.groups.items()):
+                if now - group[0] >= self.coalesce_seconds:
+                    if group[1]:
+                        self.pending.append(self.summary(key[0], group))
+                    del self.groups[key]
+
+    def flush(self):
+        # Tk thread only: moves pending lines into the model and the widget in one insert
+        if self.groups:
+            self.expire_groups()
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        if not batch:
+            return
+        self.entries.extend(batch)
+        lines = [line for level, line in batch[-self.max_lines:] if level >= self.min_level]
+        if lines:
+            self.render("".join(lines), clear=False)
+
+    def render(self, text, clear):
+        self.text.config(state="normal")
+        if clear:
+            self.text.delete("1.0", "end")
+        self.text.insert("end", text)
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.see("end")
+        self.text.config(state="disabled")
+
+    def set_level(self, level):
+        # Re-renders the kept entries through the new filter
+        self.min_level = LEVELS[level]
+        self.render("".join(line for level_number, line in self.entries if level_number >= self.min_level),
+                    clear=True)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+            self.groups.clear()
+        self.entries.clear()
+        self.render("", clear=True)
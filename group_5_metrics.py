@@ -0,0 +1,226 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import threading
+import time
+import group_5_config as config
+
+
+def log_buckets(low, high, per_decade=4):
+    count = int(round(math.log10(high / low) * per_decade))
+    return [low * 10 ** (i / per_decade) for i in range(count + 1)]
+
+
+# 10 us to 100 s, four buckets per decade
+DEFAULT_BUCKETS = log_buckets(1e-5, 100)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def read(self):
+        return self.function() if self.function else self.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Observed from several publishing or ingest threads at once
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def state(self):
+        # Consistent (counts, sum, count) copy for readers
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, fraction, state=None):
+        # Upper bound of the bucket holding the requested rank
+        counts, _, total = state or self.state()
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for bound, count in zip(self.bounds, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def read(self):
+        state = self.state()
+        return {"count": state[2], "sum": state[1],
+                "p50": self.quantile(0.5, state), "p99": self.quantile(0.99, state)}
+
+
+class MetricsRegistry:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.rates = {}
+        self.last_totals = {}
+        self.last_rate_time = time.monotonic()
+
+    def add(self, metric):
+        with self.lock:
+            metric.name = f"{self.prefix}_{metric.name}"
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, function=None):
+        return self.add(Counter(name, help_text, function))
+
+    def gauge(self, name, help_text, function=None):
+        return self.add(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help_text, buckets))
+
+    def update_rates(self):
+        # Per-second rate of every counter since the previous call
+        now = time.monotonic()
+        elapsed = now - self.last_rate_time
+        if elapsed <= 0:
+            return
+        with self.lock:
+            counters = [m for m in self.metrics.values() if m.kind == "counter"]
+        # Counters are read outside the lock; scrapes copy the rates under it
+        rates = {}
+        for metric in counters:
+            total = metric.read()
+            rates[metric.name] = (total - self.last_totals.get(metric.name, total)) / elapsed
+            self.last_totals[metric.name] = total
+        with self.lock:
+            self.rates.update(rates)
+        self.last_rate_time = now
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+            rates = dict(self.rates)
+        return {
+            "time": time.time(),
+            "metrics": {metric.name: metric.read() for metric in metrics},
+            "rates_per_sec": rates,
+        }
+
+    def render_prometheus(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+            rates = dict(self.rates)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "histogram":
+                counts, total_sum, total = metric.state()
+                cumulative = 0
+                for bound, count in zip(metric.bounds, counts):
+                    cumulative += count
+                    lines.append(f'{metric.name}_bucket{{le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{metric.name}_bucket{{le="+Inf"}} {total}')
+                lines.append(f"{metric.name}_sum {total_sum}")
+                lines.append(f"{metric.name}_count {total}")
+            else:
+                lines.append(f"{metric.name} {metric.read()}")
+        for name, rate in rates.items():
+            lines.append(f"# TYPE {name}_per_second gauge")
+            lines.append(f"{name}_per_second {rate}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    # Serves /metrics in Prometheus text format and writes periodic JSON snapshots
+    def __init__(self, registry, port=None, snapshot_path=None,
+                 interval=config.METRICS_SNAPSHOT_INTERVAL, host=config.METRICS_HOST):
+        self.registry = registry
+        self.port = port
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.host = host
+        self.http = None
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        # The reporter starts first so snapshots and rates keep going if the port can't be bound;
+        # that OSError is still raised for the caller to report
+        reporter = threading.Thread(target=self.run_reporter, name="metrics-reporter", daemon=True)
+        self.threads.append(reporter)
+        reporter.start()
+        if self.port:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.http = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.http.daemon_threads = True
+            server = threading.Thread(target=self.http.serve_forever, name="metrics-http", daemon=True)
+            self.threads.append(server)
+            server.start()
+
+    def run_reporter(self):
+        while not self.stop_event.wait(self.interval):
+            self.registry.update_rates()
+            if self.snapshot_path:
+                self.write_snapshot()
+
+    def write_snapshot(self):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.registry.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.http:
+            self.http.shutdown()
+            self.http.server_close()
+        if self.snapshot_path:
+            self.registry.update_rates()
+            self.write_snapshot()
@@ -1,22 +1,91 @@
+import itertools
 import json
+import math
 import time
 import random
+import struct
 from datetime import datetime
+from group_5_gorilla import COMPRESSED_FORMAT, encode_columns, decode_columns
 import group_5_config as config
 
+# Fixed little-endian layout: format, version, packet_id, timestamp (epoch ns), value, device_id
+BINARY_STRUCT = struct.Struct("<BBQqdI")
+BINARY_FORMAT = 0xB1
+BINARY_VERSION = 1
+
+# Envelope: format, version, reading count, then count fixed records of packet_id, timestamp, value, device_id
+ENVELOPE_HEADER = struct.Struct("<BBH")
+ENVELOPE_RECORD = struct.Struct("<QqdI")
+ENVELOPE_FORMAT = 0xB2
+ENVELOPE_MAX_READINGS = 0xFFFF
+
+# Readings from this process carry one stable device id unless the caller supplies its own
+DEFAULT_DEVICE_ID = random.randint(1000, 9999)
+
+# Default packet ids count up from the start time so concurrent callers never collide
+DEFAULT_PACKET_IDS = itertools.count(int(time.time() * 10000))
+
+# Key order and separators match json.dumps of the original reading dict
+JSON_TEMPLATE = '{"timestamp": "%s", "packet_id": %d, "value": %s, "device_id": "%s"}'
+
+
+class IsoClock:
+    # Same text as datetime.fromtimestamp(now).isoformat(), reformatting the date part once a second
+    __slots__ = ("cached",)
+
+    def __init__(self):
+        self.cached = (None, "")
+
+    def format(self, now):
+        second = int(now)
+        micros = round((now - second) * 1e6)
+        if micros == 1000000:
+            return datetime.fromtimestamp(now).isoformat()
+        cached_second, prefix = self.cached
+        if second != cached_second:
+            prefix = datetime.fromtimestamp(second).isoformat()
+            self.cached = (second, prefix)
+        return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+iso_timestamp = IsoClock().format
+
+
+def json_value(value):
+    # float repr matches json.dumps for finite values and skips the encoder setup
+    if isinstance(value, float) and math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+class PacketBuilder:
+    # Per-device packet factory: cached identity, counter packet ids, no intermediate dict
+    __slots__ = ("device_id", "device_label", "packet_ids")
+
+    def __init__(self, device_id=DEFAULT_DEVICE_ID, first_packet_id=0):
+        self.device_id = device_id
+        self.device_label = f"device_{device_id}"
+        self.packet_ids = itertools.count(first_packet_id)
+
+    def next_id(self):
+        return next(self.packet_ids)
+
+    def json(self, value, packet_id):
+        return JSON_TEMPLATE % (iso_timestamp(time.time()), packet_id, json_value(value), self.device_label)
+
+    def binary(self, value, packet_id):
+        return BINARY_STRUCT.pack(BINARY_FORMAT, BINARY_VERSION, packet_id, time.time_ns(), value, self.device_id)
+
+    def reading(self, value, packet_id):
+        return (packet_id, time.time_ns(), value, self.device_id)
+
 
 class MQTTUtils:
     @staticmethod
-    def package_data(value, packet_id=None):
+    def package_data(value, packet_id=None, device_id=DEFAULT_DEVICE_ID):
         if packet_id is None:
-            packet_id = int(time.time() * 10000 + random.randint(0, 99))
-        data = {
-            "timestamp": datetime.now().isoformat(),
-            "packet_id": packet_id,
-            "value": value,
-            "device_id": f"device_{random.randint(1000, 9999)}"
-        }
-        return json.dumps(data)
+            packet_id = next(DEFAULT_PACKET_IDS)
+        return JSON_TEMPLATE % (iso_timestamp(time.time()), packet_id, json_value(value), f"device_{device_id}")
 
     @staticmethod
     def unpack_data(json_str):
@@ -25,6 +94,113 @@ class MQTTUtils:
         except json.JSONDecodeError:
             return None
 
+    @staticmethod
+    def package_binary(value, packet_id=None, device_id=DEFAULT_DEVICE_ID):
+        if packet_id is None:
+            packet_id = next(DEFAULT_PACKET_IDS)
+        return BINARY_STRUCT.pack(BINARY_FORMAT, BINARY_VERSION, packet_id, time.time_ns(), value, device_id)
+
+    @staticmethod
+    def is_binary(payload):
+        return len(payload) > 0 and payload[0] == BINARY_FORMAT
+
+    @staticmethod
+    def unpack_binary(payload):
+        if len(payload) != BINARY_STRUCT.size or payload[0] != BINARY_FORMAT:
+            return None
+        _, version, packet_id, timestamp_ns, value, device_id = BINARY_STRUCT.unpack_from(payload)
+        if version != BINARY_VERSION:
+            return None
+        return {
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9),
+            "packet_id": packet_id,
+            "value": value,
+            "device_id": device_id
+        }
+
+    @staticmethod
+    def make_reading(value, packet_id=None, device_id=DEFAULT_DEVICE_ID):
+        if packet_id is None:
+            packet_id = next(DEFAULT_PACKET_IDS)
+        return (packet_id, time.time_ns(), value, device_id)
+
+    @staticmethod
+    def package_envelope(readings, binary=False):
+        if len(readings) > ENVELOPE_MAX_READINGS:
+            raise ValueError(f"Envelope cannot hold more than {ENVELOPE_MAX_READINGS} readings")
+        if binary:
+            buffer = bytearray(ENVELOPE_HEADER.size + ENVELOPE_RECORD.size * len(readings))
+            ENVELOPE_HEADER.pack_into(buffer, 0, ENVELOPE_FORMAT, BINARY_VERSION, len(readings))
+            offset = ENVELOPE_HEADER.size
+            for reading in readings:
+                ENVELOPE_RECORD.pack_into(buffer, offset, *reading)
+                offset += ENVELOPE_RECORD.size
+            return bytes(buffer)
+        return json.dumps({"readings": [{
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9).isoformat(),
+            "packet_id": packet_id,
+            "value": value,
+            "device_id": f"device_{device_id}"
+        } for packet_id, timestamp_ns, value, device_id in readings]})
+
+    @staticmethod
+    def package_envelope_records(records):
+        # Binary envelope around records already packed with ENVELOPE_RECORD, e.g. read back from a spool
+        count = len(records) // ENVELOPE_RECORD.size
+        if count > ENVELOPE_MAX_READINGS:
+            raise ValueError(f"Envelope cannot hold more than {ENVELOPE_MAX_READINGS} readings")
+        return ENVELOPE_HEADER.pack(ENVELOPE_FORMAT, BINARY_VERSION, count) + records
+
+    @staticmethod
+    def is_envelope(payload):
+        return len(payload) > 0 and payload[0] == ENVELOPE_FORMAT
+
+    @staticmethod
+    def unpack_envelope(payload):
+        if len(payload) < ENVELOPE_HEADER.size or payload[0] != ENVELOPE_FORMAT:
+            return None
+        _, version, count = ENVELOPE_HEADER.unpack_from(payload)
+        if version != BINARY_VERSION or len(payload) != ENVELOPE_HEADER.size + ENVELOPE_RECORD.size * count:
+            return None
+        records = memoryview(payload)[ENVELOPE_HEADER.size:]
+        return [{
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9),
+            "packet_id": packet_id,
+            "value": value,
+            "device_id": device_id
+        } for packet_id, timestamp_ns, value, device_id in ENVELOPE_RECORD.iter_unpack(records)]
+
+    @staticmethod
+    def package_compressed(readings, time_unit_ns=config.COMPRESSED_TIME_UNIT_NS):
+        # Same (packet_id, timestamp_ns, value, device_id) readings as package_envelope, Gorilla encoded
+        packet_ids, timestamps, values, device_ids = zip(*readings) if readings else ((), (), (), ())
+        return encode_columns(timestamps, device_ids, packet_ids, values, time_unit_ns)
+
+    @staticmethod
+    def is_compressed(payload):
+        return len(payload) > 0 and payload[0] == COMPRESSED_FORMAT
+
+    @staticmethod
+    def unpack_compressed_arrays(payload):
+        # {"timestamp", "device", "packet_id", "value"} NumPy arrays, or None if the payload is unusable
+        try:
+            return decode_columns(payload)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def unpack_compressed(payload):
+        columns = MQTTUtils.unpack_compressed_arrays(payload)
+        if columns is None:
+            return None
+        return [{
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9),
+            "packet_id": packet_id,
+            "value": value,
+            "device_id": device_id
+        } for timestamp_ns, packet_id, value, device_id in zip(columns["timestamp"].tolist(), columns["packet_id"].tolist(),
+                                                               columns["value"].tolist(), columns["device"].tolist())]
+
     @staticmethod
     def should_drop_packet(drop_chance=config.DROP_PACKET_CHANCE/100):
         return random.random() < drop_chance
@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
 import paho.mqtt.client as mqtt
-import time
-import threading
-import random
-from datetime import datetime
 from group_5_data_generator import DataGenerator
-from group_5_mqtt_utils import MQTTUtils
+from group_5_load_engine import LoadEngine, SimulatedDevice, WIRE_FORMATS
+from group_5_mqtt_utils import DEFAULT_DEVICE_ID
+from group_5_metrics import MetricsRegistry, MetricsServer
+from group_5_log_view import LogView, LEVELS
+from group_5_spool import Spool
 import group_5_config as config
 
 class PublisherGUI:
@@ -16,10 +16,22 @@ class PublisherGUI:
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_publish = self.on_publish
+        self.client.on_disconnect = self.on_disconnect
         self.data_generator = None
         self.publishing = False
-        self.publish_thread = None
+        self.engine = None
         self.setup_gui()
+        self.metrics = MetricsRegistry("publisher")
+        self.metrics_server = MetricsServer(self.metrics, config.METRICS_PUBLISHER_PORT,
+                                            config.METRICS_PUBLISHER_SNAPSHOT)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            self.log_status(f"Metrics endpoint unavailable: {e}")
+        # With a spool the engine keeps generating while paho reconnects and sends the backlog after
+        self.spool = Spool() if config.SPOOL_ENABLED else None
+        if self.spool is not None and self.spool.backlog:
+            self.log_status(f"Offline spool holds {self.spool.backlog} readings from an earlier run")
 
     def setup_gui(self):
         # Connection Frame
@@ -56,9 +68,19 @@ class PublisherGUI:
         pattern_combo = ttk.Combobox(data_frame, textvariable=self.pattern_var,
                                      values=["normal", "sinusoidal", "spike"], width=10)
         pattern_combo.grid(row=0, column=5, padx=2)
+        ttk.Label(data_frame, text="Format:").grid(row=0, column=6)
+        self.format_var = tk.StringVar(value=config.WIRE_FORMAT)
+        format_combo = ttk.Combobox(data_frame, textvariable=self.format_var,
+                                    values=WIRE_FORMATS, width=10, state="readonly")
+        format_combo.grid(row=0, column=7, padx=2)
+        ttk.Label(data_frame, text="QoS:").grid(row=0, column=8)
+        self.qos_var = tk.StringVar(value=str(config.PUBLISH_QOS))
+        qos_combo = ttk.Combobox(data_frame, textvariable=self.qos_var,
+                                 values=["0", "1", "2"], width=3, state="readonly")
+        qos_combo.grid(row=0, column=9, padx=2)
         self.start_button = ttk.Button(data_frame, text="Start Publishing", state="disabled",
                                        command=self.start_publishing)
-        self.start_button.grid(row=0, column=6, padx=5)
+        self.start_button.grid(row=0, column=10, padx=5)
 
         # Status Frame
         status_frame = ttk.LabelFrame(self.root, text="Status", padding="5")
@@ -68,6 +90,17 @@ class PublisherGUI:
         scrollbar = ttk.Scrollbar(status_frame, command=self.status_text.yview)
         scrollbar.grid(row=0, column=1, sticky="nsew")
         self.status_text['yscrollcommand'] = scrollbar.set
+        level_frame = ttk.Frame(status_frame)
+        level_frame.grid(row=1, column=0, sticky="w")
+        ttk.Label(level_frame, text="Level:").pack(side=tk.LEFT, padx=2)
+        self.log_level_var = tk.StringVar(value=config.LOG_LEVEL)
+        level_combo = ttk.Combobox(level_frame, textvariable=self.log_level_var,
+                                   values=list(LEVELS), width=8, state="readonly")
+        level_combo.pack(side=tk.LEFT, padx=2)
+        level_combo.bind("<<ComboboxSelected>>", self.on_log_level_selected)
+        # Worker threads log through this too; it only touches the widget from the Tk thread
+        self.status_log = LogView(self.root, self.status_text)
+        self.status_log.start()
 
     def connect_mqtt(self):
         if self.client.is_connected():
@@ -94,16 +127,19 @@ class PublisherGUI:
                 if variance < 0:
                     self.log_status("Variance cannot be negative.")
                     return
-                self.data_generator = DataGenerator(base_value, variance, 0, pattern)
-                self.publishing = True
                 topic = self.topic_entry.get()
                 if not topic:
                     self.log_status("MQTT Topic cannot be empty.")
-                    self.publishing = False
                     return
-                self.publish_thread = threading.Thread(target=self.publish_loop, args=(topic,))
-                self.publish_thread.daemon = True
-                self.publish_thread.start()
+                self.data_generator = DataGenerator(base_value, variance, 0, pattern)
+                device = SimulatedDevice(DEFAULT_DEVICE_ID, self.data_generator, 1.0 / config.PUBLISHING_TIME)
+                self.engine = LoadEngine(self.client, topic, [device], workers=1, log=self.log_status,
+                                         verbose=True, on_stopped=self.on_engine_stopped,
+                                         wire_format=self.format_var.get(), qos=int(self.qos_var.get()),
+                                         spool=self.spool)
+                self.engine.register_metrics(self.metrics)
+                self.publishing = True
+                self.engine.start()
                 self.start_button.config(text="Stop Publishing")
                 self.log_status(f"Started publishing to '{topic}'")
             except Exception as e:
@@ -111,52 +147,19 @@ class PublisherGUI:
                 self.publishing = False
                 self.start_button.config(text="Start Publishing")
         else:
-            self.publishing = False
-            self.start_button.config(text="Start Publishing")
+            self.stop_publishing()
             self.log_status("Stopped publishing.")
 
-    def publish_loop(self, topic):
-        packet_id = 0
-        while self.publishing:
-            try:
-                if MQTTUtils.should_skip_block():
-                    skip_duration = random.uniform(2, 5)
-                    self.log_status(f"Simulating block skip for {skip_duration:.1f}s...")
-                    time.sleep(skip_duration)
-                    continue
-                if random.random() < 0.005:
-                    value = self.data_generator.generate_wild_data() if self.data_generator else None
-                    log_prefix = "[WILD DATA] "
-                else:
-                    value = self.data_generator.generate() if self.data_generator else None
-                    log_prefix = ""
-                if MQTTUtils.should_drop_packet():
-                    self.log_status(f"{log_prefix}Simulating packet drop (ID: {packet_id})")
-                    packet_id += 1
-                    time.sleep(config.PUBLISHING_TIME)
-                    continue
-                payload = MQTTUtils.package_data(value, packet_id)
-                if self.client.is_connected():
-                    result, mid = self.client.publish(topic, payload)
-                    if result == mqtt.MQTT_ERR_SUCCESS:
-                        self.log_status(f"{log_prefix}Published (ID: {packet_id}): {value:.2f}")
-                    else:
-                        self.log_status(f"Failed to publish (ID: {packet_id}). Error code: {result}")
-                        if result == mqtt.MQTT_ERR_NO_CONN:
-                            self.log_status("Disconnected during publish. Stopping.")
-                            self.publishing = False
-                else:
-                    self.log_status("Client disconnected. Stopping publish loop.")
-                    self.publishing = False
-                packet_id += 1
-                time.sleep(config.PUBLISHING_TIME)
-            except Exception as e:
-                self.log_status(f"Publishing loop error: {e}")
-                if not self.client.is_connected():
-                    self.log_status("Client disconnected. Stopping publish loop.")
-                    self.publishing = False
-                time.sleep(2)
-        self.log_status("Publishing loop finished.")
+    def stop_publishing(self):
+        self.publishing = False
+        if self.engine:
+            self.engine.stop()
+        self.start_button.config(text="Start Publishing")
+
+    def on_engine_stopped(self, engine):
+        if engine is not self.engine:
+            return
+        self.publishing = False
         self.root.after(0, lambda: self.start_button.config(text="Start Publishing"))
 
     def on_connect(self, client, userdata, flags, rc):
@@ -168,29 +171,41 @@ class PublisherGUI:
             self.log_status(f"Connection failed with code {rc}")
             self.connect_button.config(state="normal")
             self.start_button.config(state="disabled")
+            if self.engine:
+                self.engine.stop(timeout=0)
             self.publishing = False
 
+    def on_disconnect(self, client, userdata, rc):
+        if rc != 0 and self.publishing and self.spool is not None:
+            self.log_status("Connection lost. Spooling readings to disk until reconnected.", "warning")
+
     def on_publish(self, client, userdata, mid):
-        # Publish acknowledgment (not used for QoS 0)
-        pass
+        # Acks for QoS 1/2 feed the engine's in-flight window
+        engine = self.engine
+        if engine is not None:
+            engine.on_publish(client, userdata, mid)
+
+    def on_log_level_selected(self, event=None):
+        self.status_log.set_level(self.log_level_var.get())
 
-    def log_status(self, message):
-        now = datetime.now().strftime("%H:%M:%S")
-        entry = f"[{now}] {message}\n"
-        self.status_text.insert(tk.END, entry)
-        self.status_text.see(tk.END)
+    def log_status(self, message, level="info"):
+        self.status_log.log(message, level)
 
     def on_closing(self):
         self.log_status("Shutdown requested. Disconnecting...")
         self.publishing = False
-        if self.publish_thread and self.publish_thread.is_alive():
-            self.publish_thread.join(timeout=1.5)
+        if self.engine:
+            self.engine.stop()
+        if self.spool is not None:
+            self.spool.close()
+        self.metrics_server.stop()
         if self.client.is_connected():
             self.client.loop_stop()
             self.client.disconnect()
             self.log_status("Disconnected from MQTT broker.")
         else:
             self.log_status("Already disconnected.")
+        self.status_log.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+import argparse
+import os
+import struct
+import time
+import group_5_config as config
+
+CAPTURE_MAGIC = b"G5CAP\x01"
+# Per message: arrival time (epoch ns), topic length, payload length, then topic and payload bytes
+RECORD_HEADER = struct.Struct("<qHI")
+
+
+# Captures being read right now, which a CaptureWriter must not truncate
+READING = set()
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        if os.path.realpath(path) in READING:
+            raise ValueError(f"{path} is being replayed and can't be recorded to")
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(CAPTURE_MAGIC)
+        self.count = 0
+
+    def write(self, arrival_ns, topic, payload):
+        topic_bytes = topic.encode("utf-8") if isinstance(topic, str) else bytes(topic)
+        self.file.write(RECORD_HEADER.pack(arrival_ns, len(topic_bytes), len(payload)))
+        self.file.write(topic_bytes)
+        self.file.write(payload)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path):
+    # Yields (arrival_ns, topic, payload) for every complete record in the file
+    real_path = os.path.realpath(path)
+    READING.add(real_path)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(CAPTURE_MAGIC):
+            raise ValueError(f"{path} is not a capture file")
+        view = memoryview(data)
+        offset = len(CAPTURE_MAGIC)
+        while offset + RECORD_HEADER.size <= len(data):
+            arrival_ns, topic_length, payload_length = RECORD_HEADER.unpack_from(data, offset)
+            offset += RECORD_HEADER.size
+            end = offset + topic_length + payload_length
+            if end > len(data):
+                break
+            topic = str(view[offset:offset + topic_length], "utf-8")
+            payload = bytes(view[offset + topic_length:end])
+            offset = end
+            yield arrival_ns, topic, payload
+    finally:
+        READING.discard(real_path)
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = {"decode": 0.0, "process": 0.0, "render": 0.0}
+        self.counts = {"decode": 0, "process": 0, "render": 0}
+
+    def wrap(self, stage, function):
+        totals, counts, clock = self.totals, self.counts, time.perf_counter
+
+        def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals[stage] += clock() - started
+                counts[stage] += 1
+        return timed
+
+
+def build_subscriber():
+    # Headless: the GUI-free core skips the Tk and matplotlib start-up cost. Replay targets
+    # never capture, so CAPTURE_PATH can't truncate or re-record the file being replayed
+    from group_5_subscriber_core import SubscriberCore
+    return SubscriberCore(capture_path=None)
+
+
+def build_gui_subscriber():
+    import tkinter as tk
+    from group_5_subscriber import SubscriberGUI
+    root = tk.Tk()
+    root.withdraw()
+    return SubscriberGUI(root, capture_path=None)
+
+
+def release(subscriber):
+    # Stops the metrics server, store and shard workers the subscriber started, and its window
+    subscriber.close()
+    if hasattr(subscriber, "status_log"):
+        subscriber.status_log.stop()
+        subscriber.root.destroy()
+
+
+def replay(path, target, speed=None, render=True):
+    # Feeds a capture straight into target.process_message. speed=None runs as fast as
+    # possible, otherwise arrival gaps are reproduced scaled by 1 / speed
+    timer = StageTimer()
+    target.process_data = timer.wrap("process", target.process_data)
+    process_message = timer.wrap("decode", target.process_message)
+    render_stage = timer.wrap("render", target.render) if render and hasattr(target, "render") else None
+    frame_interval = 1.0 / config.RENDER_FPS
+    messages = 0
+    first_arrival = None
+    started = time.perf_counter()
+    last_render = started
+    for arrival_ns, topic, payload in read_capture(path):
+        if speed:
+            if first_arrival is None:
+                first_arrival = arrival_ns
+            delay = (arrival_ns - first_arrival) / 1e9 / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        process_message(payload, topic)
+        messages += 1
+        if render_stage and time.perf_counter() - last_render >= frame_interval:
+            render_stage()
+            last_render = time.perf_counter()
+    if render_stage:
+        render_stage()
+    elapsed = time.perf_counter() - started
+    # process_message time includes process_data, so decode is what remains
+    timer.totals["decode"] -= timer.totals["process"]
+    return {
+        "messages": messages,
+        "readings": timer.counts["process"],
+        "elapsed": elapsed,
+        "messages_per_sec": messages / elapsed if elapsed > 0 else 0.0,
+        "readings_per_sec": timer.counts["process"] / elapsed if elapsed > 0 else 0.0,
+        "stage_seconds": dict(timer.totals),
+        "stage_calls": dict(timer.counts),
+    }
+
+
+def format_report(report):
+    lines = [f"Replayed {report['messages']} messages ({report['readings']} readings) in {report['elapsed']:.3f}s: "
+             f"{report['messages_per_sec']:.0f} msgs/sec, {report['readings_per_sec']:.0f} readings/sec"]
+    for stage, seconds in report["stage_seconds"].items():
+        calls = report["stage_calls"][stage]
+        per_call = seconds / calls * 1e6 if calls else 0.0
+        lines.append(f"  {stage:<8} {seconds:8.3f}s  {calls:>9} calls  {per_call:9.1f} us/call")
+    return "\n".join(lines)
+
+
+def record(path, broker, port, topic, duration):
+    import paho.mqtt.client as mqtt
+    from group_5_topic_router import parse_filters
+    topics = parse_filters(topic)
+    writer = CaptureWriter(path)
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe([(topic_filter, 0) for topic_filter in topics])
+        else:
+            print(f"Connection failed with code {rc}")
+
+    def on_message(client, userdata, msg):
+        writer.write(time.time_ns(), msg.topic, msg.payload)
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(broker, port, 60)
+    client.loop_start()
+    print(f"Recording {', '.join(topics)} from {broker}:{port} to {path}")
+    try:
+        deadline = time.monotonic() + duration if duration > 0 else None
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        writer.close()
+    print(f"Recorded {writer.count} messages")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record MQTT traffic and replay it into the subscriber pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="capture raw payloads from a broker")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--broker", default=config.MQTT_BROKER_URL)
+    record_parser.add_argument("--port", type=int, default=int(config.MQTT_BROKER_PORT))
+    record_parser.add_argument("--topic", default=config.MQTT_TOPIC)
+    record_parser.add_argument("--duration", type=float, default=0, help="seconds to record, 0 runs until Ctrl-C")
+    replay_parser = commands.add_parser("replay", help="feed a capture into the subscriber's process_message")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=None,
+                               help="replay at this multiple of real time, default is as fast as possible")
+    replay_parser.add_argument("--realtime", action="store_const", const=1.0, dest="speed")
+    replay_parser.add_argument("--gui", action="store_true", help="replay into SubscriberGUI, including its render stage")
+    replay_parser.add_argument("--no-render", action="store_true", help="skip the plot and stats refresh stage")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.path, args.broker, args.port, args.topic, args.duration)
+    else:
+        target = build_gui_subscriber() if args.gui else build_subscriber()
+        try:
+            report = replay(args.path, target, speed=args.speed, render=not args.no_render)
+        finally:
+            release(target)
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from collections import deque
+import math
+import numpy as np
+
+
+class WindowExtrema:
+    # Monotonic deques of (index, value): the front of each is the min/max of the live window
+    def __init__(self):
+        self.mins = deque()
+        self.maxs = deque()
+
+    def push(self, index, value):
+        mins, maxs = self.mins, self.maxs
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((index, value))
+        while maxs and maxs[-1][1] <= value:
+            maxs.pop()
+        maxs.append((index, value))
+
+    def expire(self, oldest):
+        mins, maxs = self.mins, self.maxs
+        while mins and mins[0][0] < oldest:
+            mins.popleft()
+        while maxs and maxs[0][0] < oldest:
+            maxs.popleft()
+
+    def clear(self):
+        self.mins.clear()
+        self.maxs.clear()
+
+    @property
+    def min(self):
+        return self.mins[0][1] if self.mins else None
+
+    @property
+    def max(self):
+        return self.maxs[0][1] if self.maxs else None
+
+
+class RingBuffer:
+    # Every sample is written twice, at i and i + capacity, so the live window is always
+    # one contiguous slice and can be handed to matplotlib without copying
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive.")
+        self.capacity = capacity
+        self.times = np.zeros(capacity * 2, dtype=np.float64)
+        self.data = np.full(capacity * 2, np.nan, dtype=np.float64)
+        self.time_extrema = WindowExtrema()
+        self.value_extrema = WindowExtrema()
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, value):
+        index = self.count
+        slot = index % self.capacity
+        self.times[slot] = self.times[slot + self.capacity] = timestamp
+        self.data[slot] = self.data[slot + self.capacity] = value
+        self.count += 1
+        oldest = self.count - self.capacity
+        self.time_extrema.push(index, timestamp)
+        self.time_extrema.expire(oldest)
+        if not math.isnan(value):
+            self.value_extrema.push(index, value)
+        self.value_extrema.expire(oldest)
+
+    def window(self):
+        size = len(self)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        return slice(start, start + size)
+
+    def timestamps(self):
+        return self.times[self.window()]
+
+    def values(self):
+        return self.data[self.window()]
+
+    def clear(self):
+        self.count = 0
+        self.data.fill(np.nan)
+        self.time_extrema.clear()
+        self.value_extrema.clear()
+
+    @property
+    def min_time(self):
+        return self.time_extrema.min
+
+    @property
+    def max_time(self):
+        return self.time_extrema.max
+
+    @property
+    def min_value(self):
+        return self.value_extrema.min
+
+    @property
+    def max_value(self):
+        return self.value_extrema.max
@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import time
+from group_5_metrics import Histogram
+import group_5_config as config
+
+CATCH_UP = "catch_up"
+SKIP = "skip"
+POLICIES = [CATCH_UP, SKIP]
+
+
+class ScheduledStream:
+    __slots__ = ("callback", "interval", "paced", "active", "runs", "skipped")
+
+    def __init__(self, callback, interval, paced):
+        self.callback = callback
+        self.interval = interval
+        self.paced = paced
+        self.active = True
+        self.runs = 0
+        self.skipped = 0
+
+
+class DeadlineScheduler:
+    # Runs many periodic streams on one thread from a heap of absolute deadlines. The next
+    # deadline is the previous deadline plus the interval, never "now" plus the interval, so
+    # callback cost and wake-up latency don't accumulate into drift
+    def __init__(self, policy=config.SCHEDULER_POLICY, max_backlog=config.SCHEDULER_MAX_BACKLOG,
+                 jitter=None, clock=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduler policy: {policy}")
+        self.policy = policy
+        self.max_backlog = max_backlog
+        self.clock = clock
+        self.jitter = jitter or Histogram("schedule_jitter_seconds", "How late scheduled publishes ran")
+        self.heap = []
+        self.sequence = itertools.count()
+        # Stretches the interval of paced streams, e.g. while flow control holds the rate back
+        self.pace = 1.0
+        self.runs = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def add(self, callback, interval, first_due=None, paced=False):
+        # callback returns None to keep its period, or a delay in seconds to restart the
+        # period that far from now (e.g. a simulated outage)
+        if interval <= 0:
+            raise ValueError("Stream interval must be positive.")
+        stream = ScheduledStream(callback, interval, paced)
+        due = self.clock() if first_due is None else first_due
+        heapq.heappush(self.heap, (due, next(self.sequence), stream))
+        return stream
+
+    def call_later(self, delay, callback):
+        # One-shot timer, cancellable like a stream
+        stream = ScheduledStream(callback, None, False)
+        heapq.heappush(self.heap, (self.clock() + delay, next(self.sequence), stream))
+        return stream
+
+    def cancel(self, stream):
+        # Lazy removal: the heap entry is dropped when it reaches the top
+        stream.active = False
+
+    def run(self, stop_event):
+        heap = self.heap
+        clock = self.clock
+        while heap and not stop_event.is_set():
+            due, _, stream = heap[0]
+            if not stream.active:
+                heapq.heappop(heap)
+                continue
+            now = clock()
+            if due > now:
+                stop_event.wait(due - now)
+                continue
+            # Popped before the callback runs, which may add or cancel timers itself
+            heapq.heappop(heap)
+            self.jitter.observe(now - due)
+            delay = stream.callback()
+            stream.runs += 1
+            self.runs += 1
+            if stream.interval is None or not stream.active:
+                continue
+            if delay is not None:
+                next_due = clock() + delay
+            else:
+                interval = stream.interval * self.pace if stream.paced else stream.interval
+                next_due = due + interval
+                behind = now - next_due
+                if behind > 0 and (self.policy == SKIP or behind > self.max_backlog):
+                    # Drop the missed runs and keep the original phase
+                    missed = int(behind / interval) + 1
+                    next_due += missed * interval
+                    stream.skipped += missed
+                    self.skipped += missed
+            heapq.heappush(heap, (next_due, next(self.sequence), stream))
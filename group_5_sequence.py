@@ -0,0 +1,108 @@
+import group_5_config as config
+
+FIRST = "first"
+IN_ORDER = "in_order"
+GAP = "gap"
+DUPLICATE = "duplicate"
+LATE = "late"
+STALE = "stale"
+RESET = "reset"
+
+
+def device_key(device_id):
+    # JSON carries "device_1234", binary carries 1234: both map to the same device
+    if isinstance(device_id, str) and device_id.startswith("device_") and device_id[7:].isdigit():
+        return int(device_id[7:])
+    return device_id
+
+
+class DeviceSequence:
+    # Bit i of window is set when packet (highest - i) has been received. Ids from floor up to
+    # highest whose bit is clear were counted as missing; ids below floor never were
+    __slots__ = ("highest", "floor", "window", "last_timestamp", "missing")
+
+    def __init__(self, packet_id, timestamp):
+        self.highest = packet_id
+        self.floor = packet_id
+        self.window = 1
+        self.last_timestamp = timestamp
+        self.missing = 0
+
+
+class SequenceTracker:
+    def __init__(self, window_size=config.SEQUENCE_WINDOW):
+        if window_size <= 0:
+            raise ValueError("Sequence window must be positive.")
+        self.window_size = window_size
+        self.window_mask = (1 << window_size) - 1
+        self.devices = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.received = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.late = 0
+        self.stale = 0
+        self.resets = 0
+
+    def clear(self):
+        self.devices.clear()
+        self.reset_counters()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def get(self, device_id):
+        return self.devices.get(device_key(device_id))
+
+    def observe(self, device_id, packet_id, timestamp):
+        # Returns (status, detail): the gap size for GAP, packets behind for DUPLICATE/LATE,
+        # and the highest id seen so far for RESET/STALE
+        self.received += 1
+        key = device_key(device_id)
+        device = self.devices.get(key)
+        if device is None:
+            self.devices[key] = DeviceSequence(packet_id, timestamp)
+            return FIRST, 0
+        offset = packet_id - device.highest
+        if offset > 0:
+            gap = offset - 1
+            device.window = ((device.window << offset) | 1) & self.window_mask if offset < self.window_size else 1
+            device.highest = packet_id
+            if timestamp > device.last_timestamp:
+                device.last_timestamp = timestamp
+            if gap:
+                device.missing += gap
+                self.missing += gap
+                return GAP, gap
+            return IN_ORDER, 0
+        if timestamp > device.last_timestamp:
+            # A lower id stamped after the newest reading means the device restarted its counter
+            previous = device.highest
+            device.highest = device.floor = packet_id
+            device.window = 1
+            device.last_timestamp = timestamp
+            self.resets += 1
+            return RESET, previous
+        age = -offset
+        if age >= self.window_size:
+            self.stale += 1
+            return STALE, device.highest
+        bit = 1 << age
+        if device.window & bit:
+            self.duplicates += 1
+            return DUPLICATE, age
+        device.window |= bit
+        if packet_id < device.floor:
+            # Older than the first packet seen, e.g. reordered at stream start: the stream now
+            # starts here, and only the ids between this one and the old start are missing
+            gap = device.floor - packet_id - 1
+            device.floor = packet_id
+            device.missing += gap
+            self.missing += gap
+        else:
+            device.missing -= 1
+            self.missing -= 1
+        self.late += 1
+        return LATE, age
@@ -0,0 +1,586 @@
+import argparse
+import math
+import multiprocessing
+import re
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+import numpy as np
+from group_5_gorilla import block_devices
+from group_5_anomaly import AnomalyDetector
+from group_5_mqtt_utils import (MQTTUtils, BINARY_STRUCT, BINARY_VERSION, ENVELOPE_HEADER, ENVELOPE_RECORD,
+                                ENVELOPE_FORMAT, ENVELOPE_MAX_READINGS)
+from group_5_sequence import SequenceTracker
+from group_5_store import device_number
+import group_5_sequence as sequence
+import group_5_config as config
+
+# Sequence statuses cross process boundaries as small integers
+STATUS_CODES = {sequence.FIRST: 0, sequence.IN_ORDER: 1, sequence.GAP: 2, sequence.DUPLICATE: 3,
+                sequence.LATE: 4, sequence.STALE: 5, sequence.RESET: 6}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+DECODE_ERROR = 7
+
+# One row per processed reading, written by a worker and consumed by the UI process
+RESULT_DTYPE = np.dtype([("time", np.int64), ("device", np.int64), ("packet_id", np.int64), ("value", np.float64),
+                         ("status", np.int64), ("detail", np.int64), ("score", np.float64)])
+# Latest per-device state, one row per device owned by the shard
+DEVICE_DTYPE = np.dtype([("device", np.int64), ("received", np.int64), ("missing", np.int64),
+                         ("anomalies", np.int64), ("last_packet_id", np.int64), ("last_time", np.int64),
+                         ("last_value", np.float64)])
+
+# Header slots (int64) at the start of every shard's shared memory block
+(HEAD, BATCHES, DEVICES, RECEIVED, MISSING, DUPLICATES, LATE, STALE, RESETS, CHECKED, ANOMALIES, DECODE_ERRORS,
+ READY) = range(13)
+HEADER_SLOTS = 16
+
+PAYLOADS, CLEAR = range(2)
+BINARY_DEVICE = struct.Struct("<I")
+DEVICE_PATTERN = re.compile(rb'"device_id":\s*("?)([^",}\s]*)')
+DEVICE_CACHE_SIZE = 65536   # SCANNED JSON DEVICE IDS REMEMBERED BEFORE THE CACHE IS RESET
+# Same layout as ENVELOPE_RECORD, for splitting binary envelopes without a Python loop
+ENVELOPE_DTYPE = np.dtype([("packet_id", "<u8"), ("timestamp", "<i8"), ("value", "<f8"), ("device", "<u4")])
+
+
+def shard_size(ring_rows, device_slots):
+    return HEADER_SLOTS * 8 + ring_rows * RESULT_DTYPE.itemsize + device_slots * DEVICE_DTYPE.itemsize
+
+
+def shard_views(buffer, ring_rows, device_slots):
+    # (header, result ring, device table) numpy views over one shared memory block
+    header = np.ndarray(HEADER_SLOTS, dtype=np.int64, buffer=buffer)
+    offset = header.nbytes
+    ring = np.ndarray(ring_rows, dtype=RESULT_DTYPE, buffer=buffer, offset=offset)
+    offset += ring.nbytes
+    devices = np.ndarray(device_slots, dtype=DEVICE_DTYPE, buffer=buffer, offset=offset)
+    return header, ring, devices
+
+
+def decode_readings(payload, shard_count=1, index=0):
+    # Returns [(packet_id, timestamp_ns, value, device_id), ...] or None if the payload is unusable.
+    # With shard_count > 1 only the readings of devices owned by shard index are kept
+    try:
+        if MQTTUtils.is_envelope(payload):
+            if len(payload) < ENVELOPE_HEADER.size:
+                return None
+            _, version, count = ENVELOPE_HEADER.unpack_from(payload)
+            if version != BINARY_VERSION or len(payload) != ENVELOPE_HEADER.size + ENVELOPE_RECORD.size * count:
+                return None
+            readings = list(ENVELOPE_RECORD.iter_unpack(memoryview(payload)[ENVELOPE_HEADER.size:]))
+        elif MQTTUtils.is_compressed(payload):
+            columns = MQTTUtils.unpack_compressed_arrays(payload)
+            if columns is None:
+                return None
+            if shard_count > 1:
+                owned = columns["device"] % shard_count == index
+                columns = {name: column[owned] for name, column in columns.items()}
+            return list(zip(columns["packet_id"].tolist(), columns["timestamp"].tolist(),
+                            columns["value"].tolist(), columns["device"].tolist()))
+        elif MQTTUtils.is_binary(payload):
+            if len(payload) != BINARY_STRUCT.size:
+                return None
+            _, version, packet_id, timestamp_ns, value, device_id = BINARY_STRUCT.unpack(payload)
+            readings = [(packet_id, timestamp_ns, value, device_id)] if version == BINARY_VERSION else None
+        else:
+            data = MQTTUtils.unpack_data(payload)
+            if isinstance(data, dict) and isinstance(data.get("readings"), list):
+                records = data["readings"]
+            elif isinstance(data, dict):
+                records = [data]
+            else:
+                return None
+            readings = [(record["packet_id"], int(datetime.fromisoformat(record["timestamp"]).timestamp() * 1e9),
+                         record["value"], record["device_id"]) for record in records]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if shard_count > 1 and readings:
+        readings = [reading for reading in readings if device_number(reading[3]) % shard_count == index]
+    return readings
+
+
+def envelope_parts(records, shard_count):
+    # [(shard, binary envelope)] for an ENVELOPE_DTYPE array: one stable sort by shard keeps each
+    # device's order, then every shard's records are one slice of the sorted bytes
+    shards = records["device"] % shard_count
+    body = records[np.argsort(shards, kind="stable")].tobytes()
+    parts = []
+    offset = 0
+    for shard, count in enumerate(np.bincount(shards, minlength=shard_count).tolist()):
+        if count:
+            end = offset + count * ENVELOPE_RECORD.size
+            parts.append((shard, ENVELOPE_HEADER.pack(ENVELOPE_FORMAT, BINARY_VERSION, count) + body[offset:end]))
+            offset = end
+    return parts
+
+
+def scanned_device(quote, text):
+    # Device number of a DEVICE_PATTERN match, as device_number gives for the decoded JSON value
+    if not quote and text.lstrip(b"-").isdigit():
+        return int(text)
+    return device_number(text.decode("utf-8", "replace"))
+
+
+def split_payload(payload, shard_count, cache=None):
+    # [(shard, payload, shared)] with every reading going to the shard that owns its device,
+    # without decoding the readings here. Envelopes mixing devices are cut into one envelope per
+    # shard: binary ones by the fixed-size records' device field, JSON ones by the raw text of
+    # each reading object. Compressed blocks can't be cut without decoding, so they go whole to
+    # every shard in their device table with shared=True, and each worker keeps only its own
+    # devices. Either way every shard sees its readings in arrival order, which forwarding
+    # readings between workers would not keep. cache maps scanned JSON device ids to shards
+    if MQTTUtils.is_envelope(payload) and len(payload) >= ENVELOPE_HEADER.size:
+        _, version, count = ENVELOPE_HEADER.unpack_from(payload)
+        if version == BINARY_VERSION and len(payload) == ENVELOPE_HEADER.size + ENVELOPE_RECORD.size * count:
+            records = np.frombuffer(payload, dtype=ENVELOPE_DTYPE, count=count, offset=ENVELOPE_HEADER.size)
+            shards = records["device"] % shard_count
+            if not count or (shards == shards[0]).all():
+                return [(int(shards[0]) if count else 0, payload, False)]
+            return [(shard, part, False) for shard, part in envelope_parts(records, shard_count)]
+        return [(0, payload, False)]
+    if MQTTUtils.is_compressed(payload):
+        try:
+            shards = np.unique(block_devices(payload) % shard_count).tolist()
+        except ValueError:
+            return [(0, payload, False)]
+        if len(shards) <= 1:
+            return [(shards[0] if shards else 0, payload, False)]
+        return [(shard, payload, True) for shard in shards]
+    if MQTTUtils.is_binary(payload):
+        if len(payload) != BINARY_STRUCT.size:
+            return [(0, payload, False)]
+        return [(BINARY_DEVICE.unpack_from(payload, BINARY_STRUCT.size - BINARY_DEVICE.size)[0] % shard_count,
+                 payload, False)]
+    if cache is None:
+        cache = {}
+    elif len(cache) > DEVICE_CACHE_SIZE:
+        cache.clear()
+    start = payload.find(b'"readings"')
+    if start < 0:
+        match = DEVICE_PATTERN.search(payload)
+        return [(0 if match is None else scanned_device(*match.groups()) % shard_count, payload, False)]
+    devices = DEVICE_PATTERN.findall(payload, start)
+    shards = []
+    for key in devices:
+        shard = cache.get(key)
+        if shard is None:
+            shard = cache[key] = scanned_device(*key) % shard_count
+        shards.append(shard)
+    owners = set(shards)
+    if len(owners) <= 1:
+        return [(owners.pop() if owners else 0, payload, False)]
+    # Reading objects as package_envelope writes them: flat, one device id each, ", " between them.
+    # Anything else goes whole to the shards it touches for the workers to sort out
+    first = payload.find(b"[{", start) + 2
+    last = payload.rfind(b"}]")
+    pieces = payload[first:last].split(b"}, {") if 1 < first <= last else []
+    if len(pieces) != len(devices) or payload.count(b"{") != len(pieces) + 1:
+        return [(shard, payload, True) for shard in sorted(owners)]
+    groups = {}
+    for shard, piece in zip(shards, pieces):
+        groups.setdefault(shard, []).append(piece)
+    return [(shard, b'{"readings": [{' + b"}, {".join(group) + b"}]}", False) for shard, group in groups.items()]
+
+
+class ShardWorker:
+    # Owns the sequence and anomaly state of every device with device_number % shard_count == index;
+    # the parent hands it payloads of those devices, some shared with other shards
+    def __init__(self, index, shard_count, buffer, ring_rows, device_slots):
+        self.index = index
+        self.shard_count = shard_count
+        self.header, self.ring, self.table = shard_views(buffer, ring_rows, device_slots)
+        self.sequences = SequenceTracker()
+        self.anomalies = AnomalyDetector()
+        self.devices = {}
+
+    def clear(self):
+        self.sequences.clear()
+        self.anomalies.clear()
+        self.devices.clear()
+        self.table[:] = 0
+        self.header[DEVICES:READY] = 0
+
+    def handle_payloads(self, payloads):
+        # A payload shared with other shards comes as (payload, first shard): this worker keeps
+        # only its own devices, and only the first shard reports it if it can't be decoded
+        readings = []
+        errors = []
+        for item in payloads:
+            if type(item) is tuple:
+                payload, first = item
+                decoded = decode_readings(payload, self.shard_count, self.index)
+                if decoded is None and first != self.index:
+                    continue
+            else:
+                payload = item
+                decoded = decode_readings(payload)
+            if decoded is None:
+                errors.append((time.time_ns(), -1, 0, math.nan, DECODE_ERROR, len(payload), math.nan))
+            else:
+                readings.extend(decoded)
+        self.header[DECODE_ERRORS] += len(errors)
+        self.process(readings, errors)
+
+    def process(self, readings, rows=None):
+        # A batch usually holds one or two readings per device, too few for observe_batch to pay off
+        rows = rows or []
+        observe_sequence = self.sequences.observe
+        observe_value = self.anomalies.observe
+        devices = self.devices
+        touched = set()
+        for packet_id, timestamp_ns, value, device_id in readings:
+            device = device_number(device_id)
+            status, detail = observe_sequence(device, packet_id, timestamp_ns)
+            state = devices.get(device)
+            if state is None:
+                state = devices[device] = [len(devices) if len(devices) < len(self.table) else -1, 0, 0, 0, 0, 0.0]
+            score = None
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                score = observe_value(device, value)
+                if score is not None:
+                    state[2] += 1
+            else:
+                value = math.nan
+            state[1] += 1
+            state[3] = packet_id
+            state[4] = timestamp_ns
+            state[5] = value
+            touched.add(device)
+            rows.append((timestamp_ns, device, packet_id, value, STATUS_CODES[status], detail,
+                         math.nan if score is None else score))
+        self.publish(rows, touched)
+
+    def publish(self, rows, touched):
+        if rows:
+            capacity = len(self.ring)
+            head = int(self.header[HEAD])
+            block = np.array(rows[-capacity:], dtype=RESULT_DTYPE)
+            head += len(rows) - len(block)
+            self.ring[(head + np.arange(len(block))) % capacity] = block
+            # Rows are written before the head moves, so the reader never sees a half-written row
+            self.header[HEAD] = head + len(block)
+        for device in touched:
+            slot, received, anomalies, packet_id, timestamp_ns, value = self.devices[device]
+            if slot >= 0:
+                tracked = self.sequences.get(device)
+                self.table[slot] = (device, received, tracked.missing, anomalies, packet_id, timestamp_ns, value)
+        sequences, header = self.sequences, self.header
+        header[DEVICES] = len(sequences)
+        header[RECEIVED] = sequences.received
+        header[MISSING] = sequences.missing
+        header[DUPLICATES] = sequences.duplicates
+        header[LATE] = sequences.late
+        header[STALE] = sequences.stale
+        header[RESETS] = sequences.resets
+        header[CHECKED] = self.anomalies.checked
+        header[ANOMALIES] = self.anomalies.anomalies
+
+
+def run_shard(index, shard_count, memory_name, ring_rows, device_slots, inbox):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    worker = ShardWorker(index, shard_count, memory.buf, ring_rows, device_slots)
+    worker.header[READY] = 1
+    try:
+        while True:
+            message = inbox.get()
+            if message is None:
+                break
+            kind, body = message
+            if kind == PAYLOADS:
+                worker.handle_payloads(body)
+                worker.header[BATCHES] += 1
+            elif kind == CLEAR:
+                worker.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del worker
+        memory.close()
+
+
+class ShardedIngest:
+    # Spreads payloads over worker processes by device id. Workers decode, track sequences and
+    # check ranges; results come back through per-shard shared memory rings and counters
+    def __init__(self, workers=config.INGEST_WORKERS, ring_rows=config.SHARD_RING_ROWS,
+                 device_slots=config.SHARD_DEVICE_SLOTS, submit_batch=config.SHARD_SUBMIT_BATCH,
+                 max_pending=config.SHARD_MAX_PENDING_BATCHES):
+        if workers <= 0:
+            raise ValueError("Sharded ingest needs at least one worker.")
+        self.worker_count = workers
+        self.ring_rows = ring_rows
+        self.device_slots = device_slots
+        self.submit_batch = submit_batch
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = [[] for _ in range(workers)]
+        self.sent = [0] * workers
+        self.tails = [0] * workers
+        self.dropped = 0
+        self.overruns = 0
+        self.device_shards = {}
+        self.memories = []
+        self.views = []
+        self.inboxes = []
+        self.processes = []
+
+    def start(self):
+        # spawn keeps the workers free of the Tk and paho state of this process
+        context = multiprocessing.get_context("spawn")
+        size = shard_size(self.ring_rows, self.device_slots)
+        self.inboxes = [context.Queue() for _ in range(self.worker_count)]
+        for index in range(self.worker_count):
+            memory = shared_memory.SharedMemory(create=True, size=size)
+            memory.buf[:size] = bytes(size)
+            self.memories.append(memory)
+            self.views.append(shard_views(memory.buf, self.ring_rows, self.device_slots))
+            process = context.Process(target=run_shard, name=f"ingest-shard-{index}", daemon=True,
+                                      args=(index, self.worker_count, memory.name, self.ring_rows,
+                                            self.device_slots, self.inboxes[index]))
+            process.start()
+            self.processes.append(process)
+
+    def wait_ready(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not all(header[READY] for header, _, _ in self.views):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def submit(self, payload):
+        # Safe to call from the paho thread; payloads are handed over in batches
+        if self.worker_count == 1:
+            parts = [(0, payload, False)]
+        else:
+            parts = split_payload(payload, self.worker_count, self.device_shards)
+        first = parts[0][0]
+        with self.lock:
+            for shard, part, shared in parts:
+                pending = self.pending[shard]
+                pending.append((part, first) if shared else part)
+                if len(pending) >= self.submit_batch:
+                    self.send(shard)
+
+    def send(self, shard):
+        batch = self.pending[shard]
+        self.pending[shard] = []
+        if self.sent[shard] - self.views[shard][0][BATCHES] >= self.max_pending:
+            self.dropped += len(batch)
+            return
+        self.sent[shard] += 1
+        self.inboxes[shard].put((PAYLOADS, batch))
+
+    def flush(self):
+        with self.lock:
+            for shard, pending in enumerate(self.pending):
+                if pending:
+                    self.send(shard)
+
+    @property
+    def backlog(self):
+        # Payloads submitted but not yet processed, counting handed-over batches as full
+        with self.lock:
+            waiting = sum(len(pending) for pending in self.pending)
+            for shard, (header, _, _) in enumerate(self.views):
+                waiting += int(self.sent[shard] - header[BATCHES]) * self.submit_batch
+        return waiting
+
+    def poll(self, limit):
+        # New result rows from every shard (at most limit each) in timestamp order
+        parts = []
+        for shard, (header, ring, _) in enumerate(self.views):
+            tail = self.tails[shard]
+            head = int(header[HEAD])
+            if head - tail > self.ring_rows:
+                self.overruns += head - self.ring_rows - tail
+                tail = head - self.ring_rows
+            count = min(head - tail, limit)
+            if count <= 0:
+                continue
+            rows = ring[(tail + np.arange(count)) % self.ring_rows]
+            # Anything the worker wrapped over while we copied is lost, not half-read
+            overwritten = int(header[HEAD]) - self.ring_rows - tail
+            if overwritten > 0:
+                self.overruns += overwritten
+                rows = rows[overwritten:]
+            self.tails[shard] = tail + count
+            parts.append(rows)
+        if not parts:
+            return np.empty(0, dtype=RESULT_DTYPE)
+        rows = np.concatenate(parts)
+        return rows[np.argsort(rows["time"], kind="stable")]
+
+    def total(self, slot):
+        return sum(int(header[slot]) for header, _, _ in self.views)
+
+    @property
+    def received(self):
+        return self.total(RECEIVED)
+
+    @property
+    def missing(self):
+        return self.total(MISSING)
+
+    @property
+    def duplicates(self):
+        return self.total(DUPLICATES)
+
+    @property
+    def late(self):
+        return self.total(LATE)
+
+    @property
+    def anomalies(self):
+        return self.total(ANOMALIES)
+
+    @property
+    def rate(self):
+        checked = self.total(CHECKED)
+        return self.anomalies / checked if checked else 0.0
+
+    def __len__(self):
+        return self.total(DEVICES)
+
+    def device_table(self):
+        # Copy of the per-device rows of every shard
+        tables = [table[:min(int(header[DEVICES]), self.device_slots)] for header, _, table in self.views]
+        return np.concatenate(tables) if tables else np.empty(0, dtype=DEVICE_DTYPE)
+
+    def clear(self):
+        self.flush()
+        for inbox in self.inboxes:
+            inbox.put((CLEAR, None))
+
+    def stop(self, timeout=2.0):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for inbox in self.inboxes:
+            inbox.close()
+        self.views.clear()
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories.clear()
+        self.processes.clear()
+
+
+def build_payloads(count, devices, wire_format, batch_size, drop_rate=0.0, seed=0):
+    # drop_rate leaves out that fraction of packet ids, so the sequence trackers see gaps
+    rng = np.random.default_rng(seed)
+    payloads = []
+    packet_ids = [0] * devices
+    readings = []
+    for i in range(count):
+        device = i % devices
+        packet_ids[device] += 1
+        if drop_rate and rng.random() < drop_rate:
+            continue
+        readings.append(MQTTUtils.make_reading(50.0 + i % 10, packet_ids[device] - 1,
+                                               config.LOAD_FIRST_DEVICE_ID + device))
+        if len(readings) >= batch_size:
+            if batch_size > 1 and wire_format == "compressed":
+                payloads.append(MQTTUtils.package_compressed(readings))
+            elif batch_size > 1 and wire_format == "json":
+                payloads.append(MQTTUtils.package_envelope(readings).encode("utf-8"))
+            elif batch_size > 1:
+                payloads.append(MQTTUtils.package_envelope(readings, binary=True))
+            elif wire_format != "json":
+                payloads.append(MQTTUtils.package_binary(readings[0][2], readings[0][0], readings[0][3]))
+            else:
+                payloads.append(MQTTUtils.package_data(readings[0][2], readings[0][0], readings[0][3]).encode("utf-8"))
+            readings = []
+    return payloads
+
+
+def measure_throughput(workers, payloads, readings):
+    ingest = ShardedIngest(workers, max_pending=len(payloads))
+    ingest.start()
+    try:
+        ingest.wait_ready()
+        consumed = 0
+        started = time.perf_counter()
+        for payload in payloads:
+            ingest.submit(payload)
+        ingest.flush()
+        while consumed < readings:
+            rows = ingest.poll(readings)
+            consumed += len(rows)
+            if not len(rows):
+                time.sleep(0.001)
+        return readings / (time.perf_counter() - started)
+    finally:
+        ingest.stop()
+
+
+def reference_counters(payloads):
+    # The same readings through one in-process SequenceTracker, in arrival order
+    tracker = SequenceTracker()
+    for payload in payloads:
+        for packet_id, timestamp_ns, value, device_id in decode_readings(payload) or ():
+            tracker.observe(device_number(device_id), packet_id, timestamp_ns)
+    return {"received": tracker.received, "missing": tracker.missing, "duplicates": tracker.duplicates,
+            "late": tracker.late}
+
+
+def sharded_counters(workers, payloads, readings):
+    ingest = ShardedIngest(workers, max_pending=len(payloads))
+    ingest.start()
+    try:
+        ingest.wait_ready()
+        for payload in payloads:
+            ingest.submit(payload)
+        ingest.flush()
+        consumed = 0
+        while consumed < readings:
+            rows = ingest.poll(readings)
+            consumed += len(rows)
+            if not len(rows):
+                time.sleep(0.001)
+        # Rows are published before a worker's counters; a batch is only done once it counts them
+        while ingest.backlog:
+            time.sleep(0.001)
+        return {"received": ingest.received, "missing": ingest.missing, "duplicates": ingest.duplicates,
+                "late": ingest.late}
+    finally:
+        ingest.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure sharded ingest throughput for different worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--readings", type=int, default=200000)
+    parser.add_argument("--devices", type=int, default=config.LOAD_DEVICE_COUNT)
+    parser.add_argument("--format", choices=["json", "binary", "compressed"], default="json")
+    parser.add_argument("--batch-size", type=int, default=1, help="readings per envelope, 1 sends single readings")
+    parser.add_argument("--drop", type=float, default=0.0, help="fraction of packets left out to create gaps")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the shard counters against one in-process SequenceTracker, exit 1 on mismatch")
+    args = parser.parse_args(argv)
+    if not 1 <= args.batch_size <= ENVELOPE_MAX_READINGS:
+        parser.error(f"--batch-size must be between 1 and {ENVELOPE_MAX_READINGS}")
+
+    payloads = build_payloads(args.readings, args.devices, args.format, args.batch_size, args.drop)
+    readings = sum(len(decode_readings(payload)) for payload in payloads)
+    print(f"{args.format}: {sum(map(len, payloads)) / readings:.1f} bytes per reading")
+    if args.verify:
+        expected = reference_counters(payloads)
+        failed = False
+        for workers in args.workers:
+            counters = sharded_counters(workers, payloads, readings)
+            matches = counters == expected
+            failed |= not matches
+            print(f"{workers:>3} worker(s): {counters} {'ok' if matches else f'MISMATCH, expected {expected}'}")
+        sys.exit(1 if failed else 0)
+    for workers in args.workers:
+        rate = measure_throughput(workers, payloads, readings)
+        print(f"{workers:>3} worker(s): {rate:12,.0f} readings/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+from group_5_mqtt_utils import ENVELOPE_RECORD
+import group_5_config as config
+
+# Segments are files of fixed-size envelope records (packet_id, timestamp, value, device_id), so a
+# run of records read back is already the body of a binary envelope
+SEGMENT_SUFFIX = ".spool"
+STATE_FILE = "spool.json"
+
+
+class Spool:
+    # Bounded, append-only disk queue of readings for while the broker can't be reached.
+    # Writers append to the newest segment file; the drain reads from the oldest with peek()
+    # and only moves past records with commit() once they were published, deleting segments
+    # as they empty. When max_segments are full the oldest segment is dropped, even while
+    # the drain is publishing from it. The read cursor is saved on flush(), so a crash can
+    # send some drained records again but loses none that didn't overflow
+    def __init__(self, directory=config.SPOOL_DIRECTORY, segment_records=config.SPOOL_SEGMENT_RECORDS,
+                 max_segments=config.SPOOL_MAX_SEGMENTS):
+        if segment_records <= 0 or max_segments < 2:
+            raise ValueError("A spool needs positive segment sizes and at least two segments.")
+        self.directory = directory
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.appended = 0
+        self.drained = 0
+        self.overflowed = 0
+        os.makedirs(directory, exist_ok=True)
+        # Records per segment, oldest first
+        self.segments = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                path = os.path.join(directory, name)
+                self.segments[int(name[:-len(SEGMENT_SUFFIX)])] = os.path.getsize(path) // ENVELOPE_RECORD.size
+        self.head = self.head_row = 0
+        state_path = os.path.join(directory, STATE_FILE)
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            self.head, self.head_row = state["head"], state["row"]
+        for sequence in [s for s in self.segments if s < self.head]:
+            self.remove_segment(sequence)
+        if self.segments and self.head not in self.segments:
+            self.head, self.head_row = min(self.segments), 0
+        self.tail = max(self.segments) if self.segments else self.head
+        if self.tail not in self.segments:
+            self.segments[self.tail] = 0
+        # A record cut short by a crash is dropped
+        self.writer = open(self.segment_path(self.tail), "ab")
+        self.writer.truncate(self.segments[self.tail] * ENVELOPE_RECORD.size)
+        self.reader = None
+        self.reader_sequence = None
+        # (token, count) of the last peek until it is committed, and rows of it whose segment
+        # overflowed before the commit
+        self.peeked = None
+        self.orphaned = 0
+        self.backlog = sum(self.segments.values()) - self.head_row
+
+    def __len__(self):
+        return self.backlog
+
+    @property
+    def backlog_bytes(self):
+        return self.backlog * ENVELOPE_RECORD.size
+
+    def segment_path(self, sequence):
+        return os.path.join(self.directory, f"{sequence:08d}{SEGMENT_SUFFIX}")
+
+    def append(self, reading):
+        self.extend((reading,))
+
+    def extend(self, readings):
+        # readings are (packet_id, timestamp_ns, value, device_id) tuples, as in an envelope
+        pack = ENVELOPE_RECORD.pack
+        with self.lock:
+            for reading in readings:
+                if self.segments[self.tail] >= self.segment_records:
+                    self.roll()
+                self.writer.write(pack(*reading))
+                self.segments[self.tail] += 1
+                self.backlog += 1
+                self.appended += 1
+
+    def roll(self):
+        self.writer.close()
+        self.tail += 1
+        self.segments[self.tail] = 0
+        self.writer = open(self.segment_path(self.tail), "ab")
+        if len(self.segments) > self.max_segments:
+            # Full: the oldest unsent readings make room for the newest. Rows the drain has
+            # peeked and may be publishing are orphaned: sent if their commit still comes
+            held = self.peeked[1] if self.peeked and self.peeked[0][0] == self.head else 0
+            lost = self.segments[self.head] - self.head_row - held
+            self.overflowed += lost
+            self.orphaned += held
+            self.peeked = None
+            self.backlog -= lost + held
+            self.remove_segment(self.head)
+            self.head += 1
+            self.head_row = 0
+
+    def remove_segment(self, sequence):
+        if self.reader_sequence == sequence:
+            self.reader.close()
+            self.reader = self.reader_sequence = None
+        del self.segments[sequence]
+        os.remove(self.segment_path(sequence))
+
+    def peek(self, limit):
+        # (records, token): up to limit of the oldest records as raw bytes, all from one segment,
+        # b"" when empty. Pass the token back to commit() with the number of records sent
+        with self.lock:
+            # Orphaned rows not committed by now weren't sent
+            self.overflowed += self.orphaned
+            self.orphaned = 0
+            self.advance()
+            token = (self.head, self.head_row)
+            count = min(limit, self.segments[self.head] - self.head_row)
+            if count <= 0:
+                return b"", token
+            if self.head == self.tail:
+                self.writer.flush()
+            if self.reader_sequence != self.head:
+                if self.reader is not None:
+                    self.reader.close()
+                self.reader = open(self.segment_path(self.head), "rb")
+                self.reader_sequence = self.head
+            self.peeked = (token, count)
+            return os.pread(self.reader.fileno(), count * ENVELOPE_RECORD.size,
+                            self.head_row * ENVELOPE_RECORD.size), token
+
+    def commit(self, count, token):
+        # Marks the first count records of the peek that returned token as sent
+        with self.lock:
+            if token != (self.head, self.head_row):
+                # An overflow dropped that segment after the peek and already took its rows off
+                # the backlog; moving the cursor now would skip unsent rows of the next segment
+                if token[0] < self.head:
+                    count = min(count, self.orphaned)
+                    self.drained += count
+                    self.overflowed += self.orphaned - count
+                    self.orphaned = 0
+                return
+            self.peeked = None
+            count = min(count, self.segments[self.head] - self.head_row)
+            self.head_row += count
+            self.backlog -= count
+            self.drained += count
+            self.advance()
+
+    def advance(self):
+        # Deletes the head segment once it is fully sent and writing has moved on
+        if self.head_row >= self.segments[self.head] and self.head != self.tail:
+            self.remove_segment(self.head)
+            self.head += 1
+            self.head_row = 0
+            self.save_state()
+
+    def save_state(self):
+        tmp_path = os.path.join(self.directory, STATE_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"head": self.head, "row": self.head_row}, f)
+        os.replace(tmp_path, os.path.join(self.directory, STATE_FILE))
+
+    def flush(self):
+        with self.lock:
+            self.writer.flush()
+            self.save_state()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.writer.close()
+            if self.reader is not None:
+                self.reader.close()
+                self.reader = self.reader_sequence = None
@@ -0,0 +1,305 @@
+import json
+import os
+import shutil
+import time
+import zlib
+import numpy as np
+from group_5_gorilla import encode_columns, write_frame, FRAME_HEADER, decode_columns
+import group_5_config as config
+
+COLUMNS = {
+    "timestamp": np.int64,   # epoch nanoseconds
+    "device": np.int64,
+    "packet_id": np.uint64,
+    "value": np.float64,
+}
+META_FILE = "segment.json"
+INDEX_FILE = "index.npy"
+BLOCKS_FILE = "blocks.g5z"
+
+
+def device_number(device_id):
+    # Numeric ids are stored as-is, anything else as a stable 32-bit hash of its text
+    if isinstance(device_id, int):
+        return device_id
+    text = str(device_id)
+    if text.startswith("device_") and text[7:].isdigit():
+        return int(text[7:])
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class Segment:
+    # One directory of fixed-capacity memory-mapped column files plus a sparse block index
+    # holding the min/max timestamp of every index_stride rows. A compressed segment keeps the
+    # same index but replaces the column files with one Gorilla block per index_stride rows
+    def __init__(self, path, capacity, index_stride, create=False):
+        self.path = path
+        self.capacity = capacity
+        self.index_stride = index_stride
+        self.sealed = False
+        self.compressed = False
+        self.frames = []
+        self.rows = 0
+        self.block_min = []
+        self.block_max = []
+        if create:
+            os.makedirs(path)
+        else:
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            self.capacity = meta["capacity"]
+            self.index_stride = meta["index_stride"]
+            self.rows = meta["rows"]
+            self.sealed = meta["sealed"]
+            self.compressed = meta.get("compressed", False)
+        if self.compressed:
+            self.columns = {}
+            self.frames = self.read_frames()
+        else:
+            mode = "r" if self.sealed else ("w+" if create else "r+")
+            self.columns = {name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode=mode,
+                                            shape=(self.capacity,))
+                            for name, dtype in COLUMNS.items()}
+        if not create:
+            self.rebuild_index()
+        if create:
+            self.write_meta()
+
+    @property
+    def full(self):
+        return self.rows >= self.capacity
+
+    @property
+    def start_time(self):
+        return min(self.block_min) if self.block_min else None
+
+    @property
+    def end_time(self):
+        return max(self.block_max) if self.block_max else None
+
+    def rebuild_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if self.sealed and os.path.exists(index_path):
+            index = np.load(index_path)
+            self.block_min, self.block_max = index[0].tolist(), index[1].tolist()
+            return
+        timestamps = self.columns["timestamp"][:self.rows]
+        self.block_min = [int(timestamps[i:i + self.index_stride].min())
+                          for i in range(0, self.rows, self.index_stride)]
+        self.block_max = [int(timestamps[i:i + self.index_stride].max())
+                          for i in range(0, self.rows, self.index_stride)]
+
+    def append(self, timestamp_ns, device, packet_id, value):
+        row = self.rows
+        columns = self.columns
+        columns["timestamp"][row] = timestamp_ns
+        columns["device"][row] = device
+        columns["packet_id"][row] = packet_id
+        columns["value"][row] = value
+        if row % self.index_stride == 0:
+            self.block_min.append(timestamp_ns)
+            self.block_max.append(timestamp_ns)
+        elif timestamp_ns < self.block_min[-1]:
+            self.block_min[-1] = timestamp_ns
+        elif timestamp_ns > self.block_max[-1]:
+            self.block_max[-1] = timestamp_ns
+        self.rows = row + 1
+
+    def write_meta(self):
+        meta = {"capacity": self.capacity, "index_stride": self.index_stride, "rows": self.rows,
+                "sealed": self.sealed, "compressed": self.compressed, "start_time": self.start_time,
+                "end_time": self.end_time}
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def flush(self):
+        if self.sealed:
+            return
+        for column in self.columns.values():
+            column.flush()
+        self.write_meta()
+
+    def seal(self):
+        self.flush()
+        np.save(os.path.join(self.path, INDEX_FILE), np.array([self.block_min, self.block_max], dtype=np.int64))
+        self.sealed = True
+        self.write_meta()
+
+    def compress(self, time_unit_ns=config.STORE_COMPRESS_TIME_UNIT_NS):
+        # Sealed segments only. Timestamps are kept to time_unit_ns; False if the rows can't be
+        # encoded (device ids wider than 32 bits), leaving the segment as it was
+        if not self.sealed or self.compressed:
+            return False
+        tmp_path = os.path.join(self.path, BLOCKS_FILE + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                for first in range(0, self.rows, self.index_stride):
+                    last = min(first + self.index_stride, self.rows)
+                    columns = {name: column[first:last] for name, column in self.columns.items()}
+                    write_frame(f, encode_columns(columns["timestamp"], columns["device"], columns["packet_id"],
+                                                  columns["value"], time_unit_ns))
+        except ValueError:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, os.path.join(self.path, BLOCKS_FILE))
+        self.compressed = True
+        self.write_meta()
+        self.columns = {}
+        for name in COLUMNS:
+            os.remove(os.path.join(self.path, f"{name}.bin"))
+        self.frames = self.read_frames()
+        return True
+
+    def read_frames(self):
+        # (offset, length) of every block in the blocks file
+        frames = []
+        with open(os.path.join(self.path, BLOCKS_FILE), "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            length, = FRAME_HEADER.unpack_from(data, offset)
+            frames.append((offset + FRAME_HEADER.size, length))
+            offset += FRAME_HEADER.size + length
+        return frames
+
+    def views(self, start_ns, end_ns):
+        # Yields dicts of column arrays covering every row that may fall in [start_ns, end_ns]:
+        # zero-copy views of the column files, or the decoded blocks of a compressed segment
+        if not self.compressed:
+            for first, last in self.blocks(start_ns, end_ns):
+                yield {name: column[first:last] for name, column in self.columns.items()}
+            return
+        with open(os.path.join(self.path, BLOCKS_FILE), "rb") as f:
+            for first, last in self.blocks(start_ns, end_ns):
+                for block in range(first // self.index_stride, -(-last // self.index_stride)):
+                    offset, length = self.frames[block]
+                    f.seek(offset)
+                    yield decode_columns(f.read(length))
+
+    def blocks(self, start_ns, end_ns):
+        # Contiguous row ranges whose blocks may hold timestamps in [start_ns, end_ns]
+        stride = self.index_stride
+        run_start = None
+        for block, (low, high) in enumerate(zip(self.block_min, self.block_max)):
+            if high >= start_ns and low <= end_ns:
+                if run_start is None:
+                    run_start = block * stride
+            elif run_start is not None:
+                yield run_start, block * stride
+                run_start = None
+        if run_start is not None:
+            yield run_start, self.rows
+
+    def close(self):
+        self.flush()
+        self.columns.clear()
+
+
+class ColumnStore:
+    def __init__(self, directory=config.STORE_DIRECTORY, segment_rows=config.STORE_SEGMENT_ROWS,
+                 index_stride=config.STORE_INDEX_STRIDE, retention_seconds=config.STORE_RETENTION_SECONDS,
+                 max_segments=config.STORE_MAX_SEGMENTS, compress=config.STORE_COMPRESS_SEALED,
+                 compress_time_unit_ns=config.STORE_COMPRESS_TIME_UNIT_NS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.index_stride = index_stride
+        self.retention_seconds = retention_seconds
+        self.max_segments = max_segments
+        self.compress = compress
+        self.compress_time_unit_ns = compress_time_unit_ns
+        os.makedirs(directory, exist_ok=True)
+        self.segments = [Segment(os.path.join(directory, name), segment_rows, index_stride)
+                         for name in sorted(os.listdir(directory))
+                         if name.startswith("segment_") and os.path.exists(os.path.join(directory, name, META_FILE))]
+        self.next_number = int(self.segments[-1].path.rsplit("_", 1)[1]) + 1 if self.segments else 0
+        if not self.segments or self.segments[-1].sealed or self.segments[-1].full:
+            self.rotate()
+        # Segments that expired while nothing was running
+        self.apply_retention()
+
+    @property
+    def active(self):
+        return self.segments[-1]
+
+    def __len__(self):
+        return sum(segment.rows for segment in self.segments)
+
+    def append(self, timestamp_ns, device_id, packet_id, value):
+        segment = self.active
+        if segment.full:
+            self.rotate()
+            segment = self.active
+        segment.append(timestamp_ns, device_number(device_id), packet_id, value)
+
+    def rotate(self):
+        if self.segments and not self.active.sealed:
+            self.active.seal()
+            if self.compress:
+                self.active.compress(self.compress_time_unit_ns)
+        path = os.path.join(self.directory, f"segment_{self.next_number:06d}")
+        self.next_number += 1
+        self.segments.append(Segment(path, self.segment_rows, self.index_stride, create=True))
+        self.apply_retention()
+
+    def retention_cutoff(self):
+        # Oldest timestamp still kept, None without a retention window
+        return time.time_ns() - int(self.retention_seconds * 1e9) if self.retention_seconds else None
+
+    def apply_retention(self):
+        # Runs on rotation, on open and with every flush, so a store that ingests slowly or
+        # not at all still drops expired segments; the active segment always stays
+        cutoff = self.retention_cutoff()
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            expired = cutoff is not None and oldest.end_time is not None and oldest.end_time < cutoff
+            if not expired and (not self.max_segments or len(self.segments) <= self.max_segments):
+                break
+            self.segments.pop(0)
+            oldest.columns.clear()
+            shutil.rmtree(oldest.path, ignore_errors=True)
+
+    def flush(self):
+        self.active.flush()
+        self.apply_retention()
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def scan(self, start_ns=None, end_ns=None):
+        # Yields dicts of column arrays covering every row that may fall in the range. Rows past
+        # the retention window are left out even before their segment is dropped
+        cutoff = self.retention_cutoff()
+        if cutoff is not None:
+            start_ns = cutoff if start_ns is None else max(start_ns, cutoff)
+        start_ns = np.iinfo(np.int64).min if start_ns is None else start_ns
+        end_ns = np.iinfo(np.int64).max if end_ns is None else end_ns
+        for segment in self.segments:
+            if not segment.rows or segment.end_time < start_ns or segment.start_time > end_ns:
+                continue
+            yield from segment.views(start_ns, end_ns)
+
+    def query(self, start_ns=None, end_ns=None, device_id=None):
+        # Exact time range (and optional device) filter; returns one array per column
+        cutoff = self.retention_cutoff()
+        if cutoff is not None:
+            start_ns = cutoff if start_ns is None else max(start_ns, cutoff)
+        low = np.iinfo(np.int64).min if start_ns is None else start_ns
+        high = np.iinfo(np.int64).max if end_ns is None else end_ns
+        device = None if device_id is None else device_number(device_id)
+        parts = {name: [] for name in COLUMNS}
+        for views in self.scan(start_ns, end_ns):
+            timestamps = views["timestamp"]
+            mask = (timestamps >= low) & (timestamps <= high)
+            if device is not None:
+                mask &= views["device"] == device
+            if mask.all():
+                for name, view in views.items():
+                    parts[name].append(view)
+            elif mask.any():
+                for name, view in views.items():
+                    parts[name].append(view[mask])
+        return {name: np.concatenate(chunks) if chunks else np.empty(0, dtype=COLUMNS[name])
+                for name, chunks in parts.items()}
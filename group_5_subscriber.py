@@ -1,37 +1,82 @@
 import tkinter as tk
 from tkinter import ttk
 import paho.mqtt.client as mqtt
-from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.dates as mdates
-from collections import deque
-from group_5_mqtt_utils import MQTTUtils
+import time
+from group_5_history import SECONDS_PER_DAY
+from group_5_log_view import LogView, LEVELS
+from group_5_topic_router import TopicRouter, parse_filters
+from group_5_subscriber_core import SubscriberCore
 from matplotlib.ticker import MaxNLocator
 import group_5_config as config
 
+ALL_SERIES = "All"
 
-class SubscriberGUI:
-    MAX_DATA_POINTS = config.MAX_DATA_POINTS
-    EXPECTED_BASE = config.EXPECTED_BASE
-    EXPECTED_VARIANCE = config.EXPECTED_VARIANCE
-    OUT_OF_RANGE_THRESHOLD_FACTOR = config.OUT_OF_RANGE_THRESHOLD_FACTOR
 
-    def __init__(self, root):
+class PipelinePanel:
+    # Separate plot window that follows one pipeline, refreshed with the main plot
+    def __init__(self, root, pipeline, on_close):
+        self.pipeline = pipeline
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Pipeline: {pipeline.key}")
+        self.stats_label = ttk.Label(self.window, text="")
+        self.stats_label.pack(fill=tk.X, padx=5, pady=2)
+        self.figure = plt.Figure(figsize=(5, 2.5), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.line, = self.ax.plot([], [], 'g.-')
+        self.ax.grid(True)
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        self.ax.xaxis.set_major_locator(MaxNLocator(nbins=4, prune='both'))
+        self.figure.subplots_adjust(bottom=0.2, left=0.15, right=0.95, top=0.95)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.window.protocol("WM_DELETE_WINDOW", lambda: on_close(self))
+
+    def update(self, plot_window):
+        pipeline = self.pipeline
+        self.stats_label.config(text=f"Received: {pipeline.received}  Missing: {pipeline.missing}  "
+                                     f"Devices: {len(pipeline)}  Anomalies: {pipeline.anomalies} ({pipeline.rate:.2%})")
+        view = pipeline.history.view(plot_window, max(int(self.ax.bbox.width), 100))
+        if view is None:
+            return
+        timestamps, values, min_val, max_val = view
+        self.line.set_data(timestamps, values)
+        time_span = max(timestamps[-1] - timestamps[0], SubscriberGUI.MIN_TIME_SPAN)
+        value_span = max_val - min_val if max_val != min_val else 1.0
+        self.ax.set_xlim(timestamps[0] - time_span * 0.01, timestamps[-1] + time_span * 0.05)
+        self.ax.set_ylim(min_val - value_span * 0.2, max_val + value_span * 0.2)
+        self.canvas.draw_idle()
+
+    def close(self):
+        self.window.destroy()
+
+
+class SubscriberGUI(SubscriberCore):
+    DRAIN_INTERVAL_MS = config.INGEST_DRAIN_INTERVAL_MS
+    MIN_TIME_SPAN = 1.0 / SECONDS_PER_DAY
+
+    def __init__(self, root, capture_path=config.CAPTURE_PATH):
         self.root = root
         self.root.title("IoT Subscriber")
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
 
-        self.data_points = deque(maxlen=self.MAX_DATA_POINTS)
-        self.last_packet_id = None
-        self.last_packet_timestamp = None
-        self.missing_packets = 0
-        self.out_of_range_count = 0
+        self.plot_window = 0
+        self.plot_background = None
         self.is_connected = False
+        self.selected_pipeline = None
+        self.series_version = -1
+        self.panels = []
+        self.frame_interval = 1.0 / config.RENDER_FPS
+        self.last_render = 0.0
 
+        # The status log has to exist before the core starts logging
         self.setup_gui()
+        SubscriberCore.__init__(self, capture_path=capture_path)
+        self.root.after(self.DRAIN_INTERVAL_MS, self.drain_queue)
 
     def setup_gui(self):
         # Connection Frame
@@ -46,7 +91,7 @@ class SubscriberGUI:
         self.port_entry.insert(0, config.MQTT_BROKER_PORT)
         self.port_entry.grid(row=0, column=3, padx=2, pady=2)
         ttk.Label(connection_frame, text="Topic:").grid(row=0, column=4, padx=2, pady=2, sticky="w")
-        self.topic_entry = ttk.Entry(connection_frame, width=20)
+        self.topic_entry = ttk.Entry(connection_frame, width=30)
         self.topic_entry.insert(0, config.MQTT_TOPIC)
         self.topic_entry.grid(row=0, column=5, padx=2, pady=2)
         self.connect_button = ttk.Button(connection_frame, text="Connect", command=self.connect_mqtt)
@@ -62,6 +107,8 @@ class SubscriberGUI:
         scrollbar = ttk.Scrollbar(data_frame, command=self.data_text.yview)
         scrollbar.grid(row=0, column=1, sticky="nsew")
         self.data_text['yscrollcommand'] = scrollbar.set
+        self.data_log = LogView(self.root, self.data_text, max_lines=config.RAW_LOG_MAX_LINES,
+                                coalesce_seconds=0, timestamps=False)
 
         # Statistics Frame
         stats_frame = ttk.LabelFrame(self.root, text="Statistics", padding="5")
@@ -69,12 +116,30 @@ class SubscriberGUI:
         ttk.Label(stats_frame, text="Missing Packets:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
         self.missing_label = ttk.Label(stats_frame, text="0", width=10)
         self.missing_label.grid(row=0, column=1, padx=5, pady=2)
-        ttk.Label(stats_frame, text="Out of Range Values:").grid(row=0, column=2, padx=5, pady=2, sticky="w")
+        ttk.Label(stats_frame, text="Anomalies:").grid(row=0, column=2, padx=5, pady=2, sticky="w")
         self.oor_label = ttk.Label(stats_frame, text="0", width=10)
         self.oor_label.grid(row=0, column=3, padx=5, pady=2)
         ttk.Label(stats_frame, text="Total Received:").grid(row=0, column=4, padx=5, pady=2, sticky="w")
         self.received_label = ttk.Label(stats_frame, text="0", width=10)
         self.received_label.grid(row=0, column=5, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Queued:").grid(row=1, column=0, padx=5, pady=2, sticky="w")
+        self.queued_label = ttk.Label(stats_frame, text="0", width=10)
+        self.queued_label.grid(row=1, column=1, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Dropped (queue full):").grid(row=1, column=2, padx=5, pady=2, sticky="w")
+        self.dropped_label = ttk.Label(stats_frame, text="0", width=10)
+        self.dropped_label.grid(row=1, column=3, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Devices:").grid(row=1, column=4, padx=5, pady=2, sticky="w")
+        self.devices_label = ttk.Label(stats_frame, text="0", width=10)
+        self.devices_label.grid(row=1, column=5, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Late (gap filled):").grid(row=2, column=0, padx=5, pady=2, sticky="w")
+        self.late_label = ttk.Label(stats_frame, text="0", width=10)
+        self.late_label.grid(row=2, column=1, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Duplicates:").grid(row=2, column=2, padx=5, pady=2, sticky="w")
+        self.duplicate_label = ttk.Label(stats_frame, text="0", width=10)
+        self.duplicate_label.grid(row=2, column=3, padx=5, pady=2)
+        ttk.Label(stats_frame, text="Anomaly Rate:").grid(row=2, column=4, padx=5, pady=2, sticky="w")
+        self.anomaly_rate_label = ttk.Label(stats_frame, text="0.00%", width=10)
+        self.anomaly_rate_label.grid(row=2, column=5, padx=5, pady=2)
 
         # Status Frame
         status_frame = ttk.LabelFrame(self.root, text="System Status", padding="5")
@@ -84,18 +149,48 @@ class SubscriberGUI:
         status_scrollbar = ttk.Scrollbar(status_frame, command=self.status_text.yview)
         status_scrollbar.grid(row=0, column=1, sticky="nsew")
         self.status_text['yscrollcommand'] = status_scrollbar.set
+        level_frame = ttk.Frame(status_frame)
+        level_frame.grid(row=1, column=0, sticky="w")
+        ttk.Label(level_frame, text="Level:").pack(side=tk.LEFT, padx=2)
+        self.log_level_var = tk.StringVar(value=config.LOG_LEVEL)
+        level_combo = ttk.Combobox(level_frame, textvariable=self.log_level_var,
+                                   values=list(LEVELS), width=8, state="readonly")
+        level_combo.pack(side=tk.LEFT, padx=2)
+        level_combo.bind("<<ComboboxSelected>>", self.on_log_level_selected)
+        self.status_log = LogView(self.root, self.status_text)
+        self.status_log.start()
 
         # Plot Frame
         plot_frame = ttk.LabelFrame(self.root, text="Data Plot", padding="5")
         plot_frame.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        window_frame = ttk.Frame(plot_frame)
+        window_frame.pack(fill=tk.X)
+        ttk.Label(window_frame, text="Window:").pack(side=tk.LEFT, padx=2)
+        self.window_var = tk.StringVar(value=next(iter(config.PLOT_WINDOWS)))
+        window_combo = ttk.Combobox(window_frame, textvariable=self.window_var,
+                                    values=list(config.PLOT_WINDOWS), width=10, state="readonly")
+        window_combo.pack(side=tk.LEFT, padx=2)
+        window_combo.bind("<<ComboboxSelected>>", self.on_window_selected)
+        ttk.Label(window_frame, text="Series:").pack(side=tk.LEFT, padx=2)
+        self.series_var = tk.StringVar(value=ALL_SERIES)
+        self.series_combo = ttk.Combobox(window_frame, textvariable=self.series_var,
+                                         values=[ALL_SERIES], width=24, state="readonly")
+        self.series_combo.pack(side=tk.LEFT, padx=2)
+        self.series_combo.bind("<<ComboboxSelected>>", self.on_series_selected)
+        ttk.Button(window_frame, text="Open Panel", command=self.open_panel).pack(side=tk.LEFT, padx=5)
         self.figure = plt.Figure(figsize=(7, 3.5), dpi=100)
         self.ax = self.figure.add_subplot(111)
-        self.line, = self.ax.plot([], [], 'b.-')
+        # The line is animated so full draws leave it out and it can be blitted on its own
+        self.line, = self.ax.plot([], [], 'b.-', animated=True)
         self.ax.set_xlabel('Time')
         self.ax.set_ylabel('Value')
         self.ax.grid(True)
         self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        self.ax.xaxis.set_major_locator(MaxNLocator(nbins=6, prune='both'))
+        self.ax.tick_params(axis='x', labelrotation=15)
+        self.figure.subplots_adjust(bottom=0.25, left=0.15, right=0.95, top=0.95)
         self.canvas = FigureCanvasTkAgg(self.figure, master=plot_frame)
+        self.canvas.mpl_connect('draw_event', self.on_plot_draw)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
         self.root.grid_rowconfigure(3, weight=1)
@@ -109,10 +204,11 @@ class SubscriberGUI:
         try:
             broker = self.broker_entry.get()
             port = int(self.port_entry.get())
-            self.topic = self.topic_entry.get()
-            if not self.topic:
+            topics = parse_filters(self.topic_entry.get())
+            if not topics:
                 self.log_status("MQTT Topic cannot be empty.")
                 return
+            self.set_topics(topics)
             self.connect_button.config(state="disabled")
             self.disconnect_button.config(state="disabled")
             self.log_status(f"Connecting to {broker}:{port}...")
@@ -129,8 +225,8 @@ class SubscriberGUI:
         try:
             self.log_status("Disconnecting from MQTT broker...")
             self.client.loop_stop()
-            if self.topic:
-                self.client.unsubscribe(self.topic)
+            if self.topics:
+                self.client.unsubscribe(self.topics)
             self.client.disconnect()
             self.log_status("Disconnected.")
             self.is_connected = False
@@ -148,16 +244,17 @@ class SubscriberGUI:
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self.log_status(f"Connected to MQTT broker at {self.broker_entry.get()}:{self.port_entry.get()}")
-            self.log_status(f"Subscribing to topic: {self.topic}")
+            self.log_status(f"Subscribing to topic(s): {', '.join(self.topics)}")
             try:
-                client.subscribe(self.topic)
+                client.subscribe([(topic_filter, 0) for topic_filter in self.topics])
                 self.is_connected = True
                 self.connect_button.config(state="disabled")
                 self.disconnect_button.config(state="normal")
                 self.broker_entry.config(state="disabled")
                 self.port_entry.config(state="disabled")
                 self.topic_entry.config(state="disabled")
-                self.reset_data()
+                # on_connect runs on paho's thread; Tk and the ingest state belong to the Tk thread
+                self.root.after(0, self.reset_data)
             except Exception as e:
                 self.log_status(f"Subscribe error: {e}")
                 self.disconnect_mqtt()
@@ -170,132 +267,149 @@ class SubscriberGUI:
             self.port_entry.config(state="normal")
             self.topic_entry.config(state="normal")
 
-    def on_message(self, client, userdata, msg):
-        self.process_message(msg.payload)
-
-    def process_message(self, payload):
+    def drain_queue(self):
         try:
-            json_str = payload.decode('utf-8')
-            data = MQTTUtils.unpack_data(json_str)
-            if data and all(k in data for k in ["timestamp", "packet_id", "value", "device_id"]):
-                self.process_data(data)
-            elif data:
-                self.log_status(f"Received malformed data: {data}")
-            else:
-                self.log_status(f"Failed to decode JSON: {json_str}")
-        except Exception as e:
-            self.log_status(f"Processing error: {e}")
+            self.drain()
+            now = time.monotonic()
+            if self.display_dirty and now - self.last_render >= self.frame_interval:
+                self.render()
+                self.last_render = now
+            elif now - self.last_render >= 1.0:
+                # Keep queue counters live even when nothing new was processed
+                self.update_stats_display()
+                self.last_render = now
+        finally:
+            self.root.after(self.DRAIN_INTERVAL_MS, self.drain_queue)
 
-    def process_data(self, data):
-        current_packet_id = data["packet_id"]
-        value = data["value"]
-        timestamp_str = data["timestamp"]
-        try:
-            timestamp = datetime.fromisoformat(timestamp_str)
-        except Exception:
-            self.log_status(f"Invalid timestamp: {timestamp_str}")
-            timestamp = datetime.now()
-
-        if self.last_packet_timestamp is None or timestamp > self.last_packet_timestamp:
-            if self.last_packet_timestamp is not None and current_packet_id < self.last_packet_id:
-                self.log_status(f"New session detected. Resetting packet ID from {self.last_packet_id} to {current_packet_id}.", level="info")
-            elif self.last_packet_timestamp is not None and current_packet_id > self.last_packet_id:
-                if current_packet_id > self.last_packet_id + 1:
-                    missing = current_packet_id - self.last_packet_id - 1
-                    self.missing_packets += missing
-                    self.log_status(f"Detected {missing} missing packet(s) from {self.last_packet_id} to {current_packet_id}.")
-            self.last_packet_id = current_packet_id
-            self.last_packet_timestamp = timestamp
-        else:
-            self.log_status(f"Received out-of-order packet: ID {current_packet_id} after {self.last_packet_id}", level="warning")
-
-        expected_min = self.EXPECTED_BASE - self.EXPECTED_VARIANCE * self.OUT_OF_RANGE_THRESHOLD_FACTOR
-        expected_max = self.EXPECTED_BASE + self.EXPECTED_VARIANCE * self.OUT_OF_RANGE_THRESHOLD_FACTOR
-        if isinstance(value, (int, float)):
-            if not (expected_min <= value <= expected_max):
-                self.out_of_range_count += 1
-                self.log_status(f"Out of range value: {value:.2f} (Expected {expected_min:.1f}-{expected_max:.1f})", level="warning")
-        else:
-            self.log_status(f"Non-numeric value: {value}", level="warning")
-        self.data_points.append((timestamp, value))
-        self.update_raw_data_display(data)
+    def render(self):
+        started = time.perf_counter()
+        self.display_dirty = False
+        if self.pending_records:
+            self.update_raw_data_display(*self.pending_records)
+            self.pending_records.clear()
+        if self.router.version != self.series_version:
+            self.update_series_list()
         self.update_stats_display()
         self.update_plot()
+        for panel in self.panels:
+            panel.update(self.plot_window)
+        self.render_seconds.observe(time.perf_counter() - started)
 
-    def update_raw_data_display(self, data):
-        self.data_text.config(state="normal")
-        value_str = f"{data['value']:.4f}" if isinstance(data['value'], (int, float)) else str(data['value'])
-        entry = f"Time: {data['timestamp']}\n PktID: {data['packet_id']}\n Value: {value_str}\n Device: {data['device_id']}\n{'-'*30}\n"
-        self.data_text.insert(tk.END, entry)
-        self.data_text.see(tk.END)
-        self.data_text.config(state="disabled")
+    def update_raw_data_display(self, *records):
+        entries = []
+        for data in records:
+            value_str = f"{data['value']:.4f}" if isinstance(data['value'], (int, float)) else str(data['value'])
+            entries.append(f"Time: {data['timestamp']}\n PktID: {data['packet_id']}\n Value: {value_str}\n Device: {data['device_id']}\n{'-'*30}\n")
+        self.data_log.write("".join(entries))
+        self.data_log.flush()
 
     def update_stats_display(self):
-        self.missing_label.config(text=str(self.missing_packets))
-        self.oor_label.config(text=str(self.out_of_range_count))
-        self.received_label.config(text=str(len(self.data_points)))
+        sequences, anomalies = self.sequence_stats, self.anomaly_stats
+        if self.selected_pipeline is not None:
+            sequences = anomalies = self.selected_pipeline
+        self.missing_label.config(text=str(sequences.missing))
+        self.late_label.config(text=str(sequences.late))
+        self.duplicate_label.config(text=str(sequences.duplicates))
+        self.devices_label.config(text=str(len(sequences)))
+        self.oor_label.config(text=str(anomalies.anomalies))
+        self.anomaly_rate_label.config(text=f"{anomalies.rate:.2%}")
+        self.received_label.config(text=str(sequences.received))
+        self.queued_label.config(text=str(self.queue_depth()))
+        self.dropped_label.config(text=str(self.dropped_total()))
 
     def update_plot(self):
-        if self.data_points:
-            plot_data = [(t, v) for t, v in self.data_points if isinstance(v, (int, float))]
-            if not plot_data:
-                self.line.set_data([], [])
-                self.canvas.draw_idle()
-                return
-            timestamps, values = zip(*plot_data)
-            min_val, max_val = min(values), max(values)
-            min_time, max_time = min(timestamps), max(timestamps)
-            y_pad = (max_val - min_val) * 0.1 if max_val != min_val else 1.0
-            total_seconds = (max_time - min_time).total_seconds()
-            time_buffer = timedelta(seconds=1) if total_seconds == 0 else timedelta(seconds=max(total_seconds * 0.01, 1))
-            self.line.set_data(timestamps, values)
-            self.ax.set_ylim(min_val - y_pad, max_val + y_pad)
-            self.ax.set_xlim(min_time - time_buffer, max_time + time_buffer)
-            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-            self.ax.xaxis.set_major_locator(MaxNLocator(nbins=6, prune='both'))
-            for label in self.ax.get_xticklabels():
-                label.set_rotation(15)
-            self.figure.subplots_adjust(bottom=0.25, left=0.15, right=0.95, top=0.95)
-            self.canvas.draw_idle()
-        else:
+        history = self.history if self.selected_pipeline is None else self.selected_pipeline.history
+        view = history.view(self.plot_window, max(int(self.ax.bbox.width), 100))
+        if view is None:
             self.line.set_data([], [])
-            self.ax.relim()
-            self.ax.autoscale_view()
             self.canvas.draw_idle()
+            return
+        timestamps, values, min_val, max_val = view
+        self.line.set_data(timestamps, values)
+        if self.fit_axes(timestamps[0], timestamps[-1], min_val, max_val) or self.plot_background is None:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.restore_region(self.plot_background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.ax.bbox)
+
+    def fit_axes(self, min_time, max_time, min_val, max_val):
+        # Limits get headroom so a full redraw is only needed when data leaves the view
+        x_low, x_high = self.ax.get_xlim()
+        y_low, y_high = self.ax.get_ylim()
+        time_span = max(max_time - min_time, self.MIN_TIME_SPAN)
+        value_span = max_val - min_val if max_val != min_val else 1.0
+        if (x_low <= min_time and max_time <= x_high and x_high - x_low <= time_span * 2
+                and y_low <= min_val and max_val <= y_high and y_high - y_low <= value_span * 2):
+            return False
+        self.ax.set_xlim(min_time - time_span * 0.01, max_time + time_span * 0.25)
+        self.ax.set_ylim(min_val - value_span * 0.2, max_val + value_span * 0.2)
+        return True
+
+    def on_window_selected(self, event=None):
+        self.plot_window = config.PLOT_WINDOWS.get(self.window_var.get(), 0)
+        self.display_dirty = True
+
+    def update_series_list(self):
+        self.series_version = self.router.version
+        self.series_combo.config(values=[ALL_SERIES] + sorted(self.router.pipelines))
+
+    def on_series_selected(self, event=None):
+        self.selected_pipeline = self.router.get(self.series_var.get())
+        self.display_dirty = True
+
+    def open_panel(self):
+        if self.selected_pipeline is None:
+            self.log_status("Pick a series other than 'All' to open its panel.")
+            return
+        self.panels.append(PipelinePanel(self.root, self.selected_pipeline, self.close_panel))
+        self.display_dirty = True
+
+    def close_panel(self, panel):
+        self.panels.remove(panel)
+        panel.close()
+
+    def set_topics(self, topics):
+        # New subscriptions start a fresh set of pipelines
+        for panel in list(self.panels):
+            self.close_panel(panel)
+        self.topics = topics
+        self.router = TopicRouter(topics)
+        self.selected_pipeline = None
+        self.series_var.set(ALL_SERIES)
+        self.update_series_list()
+
+    def on_plot_draw(self, event):
+        self.plot_background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+
+    def on_log_level_selected(self, event=None):
+        self.status_log.set_level(self.log_level_var.get())
 
     def log_status(self, message, level="info"):
-        now = datetime.now().strftime("%H:%M:%S")
-        prefix = f"[{now}] "
-        if level == "warning":
-            prefix += "[WARN] "
-        elif level == "error":
-            prefix += "[ERROR] "
-        self.status_text.config(state="normal")
-        self.status_text.insert(tk.END, f"{prefix}{message}\n")
-        self.status_text.see(tk.END)
-        self.status_text.config(state="disabled")
+        self.status_log.log(message, level)
 
     def reset_data(self):
-        self.data_points.clear()
-        self.last_packet_id = None
-        self.last_packet_timestamp = None
-        self.missing_packets = 0
-        self.out_of_range_count = 0
+        SubscriberCore.reset_data(self)
         self.missing_label.config(text="0")
+        self.late_label.config(text="0")
+        self.duplicate_label.config(text="0")
+        self.devices_label.config(text="0")
         self.oor_label.config(text="0")
+        self.anomaly_rate_label.config(text="0.00%")
         self.received_label.config(text="0")
         self.line.set_data([], [])
         self.ax.relim()
         self.ax.autoscale_view()
         self.canvas.draw_idle()
-        self.data_text.config(state="normal")
-        self.data_text.delete("1.0", tk.END)
-        self.data_text.config(state="disabled")
+        self.data_log.clear()
         self.log_status("Data and statistics reset.")
 
     def on_closing(self):
         self.log_status("Shutdown requested.")
         self.disconnect_mqtt()
+        self.close()
+        self.status_log.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
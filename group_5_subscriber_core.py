@@ -0,0 +1,428 @@
+from collections import deque
+from datetime import datetime
+import argparse
+import json
+import math
+import queue
+import time
+from group_5_mqtt_utils import MQTTUtils
+from group_5_history import TieredHistory, SECONDS_PER_DAY
+from group_5_sequence import SequenceTracker
+from group_5_anomaly import AnomalyDetector
+from group_5_store import ColumnStore
+from group_5_replay import CaptureWriter
+from group_5_metrics import MetricsRegistry, MetricsServer
+from group_5_sharded_ingest import ShardedIngest, STATUS_NAMES, DECODE_ERROR
+from group_5_log_view import LEVELS
+from group_5_topic_router import TopicRouter, parse_filters
+import group_5_sequence as sequence
+import group_5_config as config
+
+# Matplotlib date numbers are days since the Unix epoch, naive datetimes taken as-is
+EPOCH = datetime(1970, 1, 1)
+
+
+class SubscriberCore:
+    # Everything the subscriber does with a payload, without Tk or matplotlib: decoding,
+    # sequence and anomaly tracking, topic routing, history, persistence and metrics.
+    # SubscriberGUI builds on it; main() runs it headless
+    MAX_DATA_POINTS = config.MAX_DATA_POINTS
+    DRAIN_BATCH = config.INGEST_DRAIN_BATCH
+    REQUIRED_KEYS = ("timestamp", "packet_id", "value", "device_id")
+
+    def __init__(self, topics=None, log=None, metrics_port=config.METRICS_SUBSCRIBER_PORT,
+                 capture_path=config.CAPTURE_PATH):
+        self.log = log
+        self.metrics_port = metrics_port
+        self.history = TieredHistory(self.MAX_DATA_POINTS)
+        self.sequences = SequenceTracker()
+        self.anomalies = AnomalyDetector(on_anomaly=self.on_anomaly)
+        self.shards = ShardedIngest() if config.INGEST_WORKERS > 0 else None
+        # With sharded ingest the counters live in the workers' shared memory
+        self.sequence_stats = self.sequences if self.shards is None else self.shards
+        self.anomaly_stats = self.anomalies if self.shards is None else self.shards
+        self.topics = topics or parse_filters(config.MQTT_TOPIC)
+        self.router = TopicRouter(self.topics)
+
+        self.ingest_queue = queue.Queue(maxsize=config.INGEST_QUEUE_SIZE)
+        self.dropped_messages = 0
+        self.pending_records = deque(maxlen=config.RAW_LOG_MAX_PER_FRAME)
+        self.display_dirty = False
+
+        self.store = None
+        self.last_store_flush = time.monotonic()
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+
+        self.setup_metrics()
+        if self.shards is not None:
+            self.shards.start()
+            self.log_status(f"Decoding on {config.INGEST_WORKERS} worker process(es), sharded by device")
+            if self.router.key != "device":
+                self.log_status("Workers don't see topics: only device pipelines are filled with sharded ingest",
+                                level="warning")
+        if config.STORE_ENABLED:
+            try:
+                self.store = ColumnStore()
+                self.log_status(f"Persisting readings to '{config.STORE_DIRECTORY}' ({len(self.store)} stored)")
+            except Exception as e:
+                self.log_status(f"Store error, persistence disabled: {e}", level="error")
+
+    def on_message(self, client, userdata, msg):
+        # Runs on paho's network thread: only enqueue, drain() does the work
+        self.messages_received.inc()
+        if self.capture is not None:
+            self.capture.write(time.time_ns(), msg.topic, msg.payload)
+        if self.shards is not None:
+            self.shards.submit(msg.payload)
+            return
+        try:
+            self.ingest_queue.put_nowait((msg.payload, msg.topic))
+        except queue.Full:
+            self.dropped_messages += 1
+
+    def process_message(self, payload, topic=None):
+        try:
+            started = time.perf_counter()
+            data, readings, error = self.decode_payload(payload)
+            decoded = time.perf_counter()
+            self.decode_seconds.observe(decoded - started)
+            if error:
+                self.log_status(error)
+                return
+            if readings is not None:
+                self.process_batch(readings, topic)
+            else:
+                self.process_data(data, topic)
+            self.process_seconds.observe(time.perf_counter() - decoded)
+        except Exception as e:
+            self.log_status(f"Processing error: {e}")
+
+    def decode_payload(self, payload):
+        # Returns (reading, envelope readings, error message) with only one of them set
+        if MQTTUtils.is_envelope(payload):
+            readings = MQTTUtils.unpack_envelope(payload)
+            if readings is None:
+                return None, None, f"Failed to decode envelope ({len(payload)} bytes)"
+            return None, readings, None
+        if MQTTUtils.is_compressed(payload):
+            readings = MQTTUtils.unpack_compressed(payload)
+            if readings is None:
+                return None, None, f"Failed to decode compressed envelope ({len(payload)} bytes)"
+            return None, readings, None
+        if MQTTUtils.is_binary(payload):
+            data = MQTTUtils.unpack_binary(payload)
+            if not data:
+                return None, None, f"Failed to decode binary payload ({len(payload)} bytes)"
+            return data, None, None
+        json_str = payload.decode('utf-8')
+        data = MQTTUtils.unpack_data(json_str)
+        if isinstance(data, dict) and isinstance(data.get("readings"), list):
+            return None, data["readings"], None
+        if data and all(k in data for k in self.REQUIRED_KEYS):
+            return data, None, None
+        if data:
+            return None, None, f"Received malformed data: {data}"
+        return None, None, f"Failed to decode JSON: {json_str}"
+
+    def process_batch(self, readings, topic=None):
+        device_ids = []
+        values = []
+        routed = []
+        for data in readings:
+            if isinstance(data, dict) and all(k in data for k in self.REQUIRED_KEYS):
+                pipelines = self.process_data(data, topic, detect_anomalies=False)
+                if isinstance(data["value"], (int, float)):
+                    device_ids.append(data["device_id"])
+                    values.append(data["value"])
+                    routed.append(pipelines)
+            else:
+                self.log_status(f"Received malformed data: {data}")
+        if values:
+            mask = self.anomalies.observe_batch(device_ids, values)
+            for flagged, pipelines in zip(mask.tolist(), routed):
+                if flagged:
+                    for pipeline in pipelines:
+                        pipeline.anomalies += 1
+
+    def on_anomaly(self, event):
+        self.log_status(f"Anomalous value from {event.device_id}: {event.value:.2f} (z={event.score:.1f})", level="warning")
+
+    def process_data(self, data, topic=None, detect_anomalies=True):
+        # Returns the topic pipelines the reading was routed to
+        current_packet_id = data["packet_id"]
+        value = data["value"]
+        timestamp_str = data["timestamp"]
+        if isinstance(timestamp_str, datetime):
+            timestamp = timestamp_str
+        else:
+            try:
+                timestamp = datetime.fromisoformat(timestamp_str)
+            except Exception:
+                self.log_status(f"Invalid timestamp: {timestamp_str}")
+                timestamp = datetime.now()
+
+        self.latency_seconds.observe(time.time() - timestamp.timestamp())
+        device_id = data["device_id"]
+        status, detail = self.sequences.observe(device_id, current_packet_id, timestamp)
+        self.log_sequence(status, detail, device_id, current_packet_id)
+
+        pipelines = self.router.route(topic, device_id)
+        if isinstance(value, (int, float)):
+            if detect_anomalies and self.anomalies.observe(device_id, value) is not None:
+                for pipeline in pipelines:
+                    pipeline.anomalies += 1
+        else:
+            self.log_status(f"Non-numeric value: {value}", level="warning")
+        plot_value = value if isinstance(value, (int, float)) else math.nan
+        time_days = (timestamp - EPOCH).total_seconds() / SECONDS_PER_DAY
+        self.history.append(time_days, plot_value)
+        for pipeline in pipelines:
+            pipeline.observe(time_days, device_id, current_packet_id, timestamp, plot_value)
+        if self.store is not None and not math.isnan(plot_value):
+            self.store.append(int(timestamp.timestamp() * 1e9), device_id, current_packet_id, plot_value)
+        self.pending_records.append(data)
+        self.display_dirty = True
+        return pipelines
+
+    def log_sequence(self, status, detail, device_id, packet_id):
+        if status == sequence.GAP:
+            self.log_status(f"Detected {detail} missing packet(s) from {device_id}: {packet_id - detail - 1} to {packet_id}.")
+        elif status == sequence.LATE:
+            self.log_status(f"Late packet ID {packet_id} from {device_id} filled a gap.")
+        elif status == sequence.DUPLICATE:
+            self.log_status(f"Duplicate packet ID {packet_id} from {device_id}", level="warning")
+        elif status == sequence.RESET:
+            self.log_status(f"New session detected for {device_id}. Resetting packet ID from {detail} to {packet_id}.", level="info")
+        elif status == sequence.STALE:
+            self.log_status(f"Received out-of-order packet: ID {packet_id} after {detail} from {device_id}", level="warning")
+
+    def process_results(self, rows):
+        # Rows from the shard workers are already decoded, sequenced and checked
+        now = time.time()
+        utc_offset = time.localtime(now).tm_gmtoff
+        for time_ns, device, packet_id, value, status, detail, score in rows.tolist():
+            if status == DECODE_ERROR:
+                self.log_status(f"Failed to decode payload ({detail} bytes)")
+                continue
+            device_id = f"device_{device}"
+            self.log_sequence(STATUS_NAMES[status], detail, device_id, packet_id)
+            if not math.isnan(score):
+                self.log_status(f"Anomalous value from {device_id}: {value:.2f} (z={score:.1f})", level="warning")
+            timestamp = time_ns / 1e9
+            self.latency_seconds.observe(now - timestamp)
+            time_days = (timestamp + utc_offset) / SECONDS_PER_DAY
+            self.history.append(time_days, value)
+            for pipeline in self.router.route(None, device):
+                pipeline.observe(time_days, device, packet_id, timestamp, value)
+                if not math.isnan(score):
+                    pipeline.anomalies += 1
+            if math.isnan(value):
+                self.log_status(f"Non-numeric value from {device_id}", level="warning")
+            elif self.store is not None:
+                self.store.append(time_ns, device, packet_id, value)
+        for time_ns, device, packet_id, value, status, detail, score in rows[-self.pending_records.maxlen:].tolist():
+            if status != DECODE_ERROR:
+                self.pending_records.append({"timestamp": datetime.fromtimestamp(time_ns / 1e9), "packet_id": packet_id,
+                                             "value": value, "device_id": f"device_{device}"})
+        self.display_dirty = True
+
+    def queue_depth(self):
+        return self.ingest_queue.qsize() if self.shards is None else self.shards.backlog
+
+    def dropped_total(self):
+        return self.dropped_messages + (self.shards.dropped if self.shards is not None else 0)
+
+    def setup_metrics(self):
+        metrics = self.metrics = MetricsRegistry("subscriber")
+        self.messages_received = metrics.counter("messages_received_total", "MQTT messages received")
+        metrics.counter("messages_dropped_total", "Messages dropped because the ingest queue was full",
+                        self.dropped_total)
+        metrics.counter("readings_total", "Readings processed", lambda: self.sequence_stats.received)
+        metrics.counter("missing_packets_total", "Packets detected as missing", lambda: self.sequence_stats.missing)
+        metrics.counter("late_packets_total", "Late packets that filled a gap", lambda: self.sequence_stats.late)
+        metrics.counter("duplicate_packets_total", "Duplicate packets", lambda: self.sequence_stats.duplicates)
+        metrics.counter("anomalies_total", "Readings flagged as anomalous", lambda: self.anomaly_stats.anomalies)
+        metrics.gauge("anomaly_ratio", "Fraction of checked readings flagged as anomalous",
+                      lambda: self.anomaly_stats.rate)
+        metrics.gauge("devices", "Devices seen", lambda: len(self.sequence_stats))
+        metrics.gauge("ingest_queue_depth", "Messages waiting in the ingest queue", self.queue_depth)
+        metrics.gauge("pending_display_records", "Raw readings waiting for the next frame",
+                      lambda: len(self.pending_records))
+        self.latency_seconds = metrics.histogram("latency_seconds", "Publish to processing latency")
+        self.decode_seconds = metrics.histogram("decode_seconds", "Time spent decoding a message")
+        self.process_seconds = metrics.histogram("process_seconds", "Time spent processing a decoded message")
+        self.render_seconds = metrics.histogram("render_seconds", "Time spent refreshing plot and statistics")
+        self.metrics_server = MetricsServer(metrics, self.metrics_port, config.METRICS_SUBSCRIBER_SNAPSHOT)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            self.log_status(f"Metrics endpoint unavailable: {e}", level="warning")
+
+    def drain(self, limit=None):
+        # Processes up to limit queued messages (or shard result rows); returns how many
+        limit = self.DRAIN_BATCH if limit is None else limit
+        processed = 0
+        if self.shards is not None:
+            self.shards.flush()
+            rows = self.shards.poll(limit)
+            if len(rows):
+                self.process_results(rows)
+            processed = len(rows)
+        else:
+            while processed < limit:
+                try:
+                    payload, topic = self.ingest_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.process_message(payload, topic)
+                processed += 1
+        now = time.monotonic()
+        if self.store is not None and now - self.last_store_flush >= config.STORE_FLUSH_INTERVAL:
+            self.store.flush()
+            self.last_store_flush = now
+        return processed
+
+    def stats(self):
+        sequences, anomalies = self.sequence_stats, self.anomaly_stats
+        return {
+            "received": sequences.received,
+            "missing": sequences.missing,
+            "late": sequences.late,
+            "duplicates": sequences.duplicates,
+            "devices": len(sequences),
+            "anomalies": anomalies.anomalies,
+            "anomaly_rate": anomalies.rate,
+            "queued": self.queue_depth(),
+            "dropped": self.dropped_total(),
+            "pipelines": {pipeline.key: {"received": pipeline.received, "missing": pipeline.missing,
+                                         "devices": len(pipeline), "anomalies": pipeline.anomalies}
+                          for pipeline in self.router},
+        }
+
+    def log_status(self, message, level="info"):
+        if self.log is not None:
+            self.log(message, level)
+
+    def reset_data(self):
+        # Messages queued before the reset would otherwise land in the fresh statistics
+        while True:
+            try:
+                self.ingest_queue.get_nowait()
+            except queue.Empty:
+                break
+        self.history.clear()
+        self.router.clear()
+        self.sequences.clear()
+        self.anomalies.clear()
+        if self.shards is not None:
+            self.shards.clear()
+        self.pending_records.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+        if self.capture is not None:
+            self.capture.close()
+        if self.shards is not None:
+            self.shards.stop()
+        self.metrics_server.stop()
+
+
+def format_stats(stats):
+    return (f"received={stats['received']} missing={stats['missing']} late={stats['late']} "
+            f"duplicates={stats['duplicates']} devices={stats['devices']} anomalies={stats['anomalies']} "
+            f"({stats['anomaly_rate']:.2%}) queued={stats['queued']} dropped={stats['dropped']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless subscriber: ingest from a broker and report statistics")
+    parser.add_argument("--broker", default=config.MQTT_BROKER_URL)
+    parser.add_argument("--port", type=int, default=int(config.MQTT_BROKER_PORT))
+    parser.add_argument("--topic", default=config.MQTT_TOPIC, help="comma-separated filters, + and # allowed")
+    parser.add_argument("--brokers", default=config.MQTT_BROKERS,
+                        help="comma-separated host:port list served by an asyncio connection pool")
+    parser.add_argument("--connections", type=int, default=config.POOL_CONNECTIONS_PER_BROKER,
+                        help="pooled connections per broker, the filters are spread across them")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 runs until Ctrl-C")
+    parser.add_argument("--interval", type=float, default=config.LOAD_REPORT_INTERVAL,
+                        help="seconds between statistics lines, 0 only reports at exit")
+    parser.add_argument("--json", action="store_true", help="print statistics as JSON lines")
+    parser.add_argument("--export", metavar="PATH", help="write the final statistics to this JSON file")
+    parser.add_argument("--log-level", choices=list(LEVELS), default="warning")
+    parser.add_argument("--metrics-port", type=int, default=config.METRICS_SUBSCRIBER_PORT,
+                        help="Prometheus endpoint port, 0 disables")
+    args = parser.parse_args(argv)
+    try:
+        topics = parse_filters(args.topic)
+    except ValueError as e:
+        parser.error(str(e))
+    if not topics:
+        parser.error("at least one topic filter is required")
+
+    def log(message, level):
+        if LEVELS.get(level, LEVELS["info"]) >= LEVELS[args.log_level]:
+            print(f"[{level.upper()}] {message}", flush=True)
+
+    def report():
+        stats = core.stats()
+        print(json.dumps(stats) if args.json else format_stats(stats), flush=True)
+
+    import paho.mqtt.client as mqtt
+    from group_5_async_mqtt import ConnectionPool, parse_brokers
+    brokers = parse_brokers(args.brokers, args.port) if args.brokers else [(args.broker, args.port)]
+    pooled = len(brokers) > 1 or args.connections > 1
+    core = SubscriberCore(topics, log=log, metrics_port=args.metrics_port)
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe([(topic_filter, 0) for topic_filter in topics])
+            log(f"Subscribed to {', '.join(topics)} on {args.broker}:{args.port}", "info")
+        else:
+            log(f"Connection failed with code {rc}", "error")
+
+    if pooled:
+        # Every broker gets every filter; connections resubscribe by themselves after a reconnect
+        client = ConnectionPool(brokers, args.connections, log=log)
+        client.on_message = core.on_message
+        client.subscribe(topics)
+        if not client.start(timeout=10):
+            log(f"Only {client.connected} of {len(client)} connections are up, the rest keep retrying", "warning")
+    else:
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_message = core.on_message
+        try:
+            client.connect(args.broker, args.port, 60)
+        except OSError as e:
+            core.close()
+            parser.exit(1, f"Connection error: {e}\n")
+        client.loop_start()
+    drain_interval = config.INGEST_DRAIN_INTERVAL_MS / 1000.0
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    next_report = time.monotonic() + args.interval
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            if core.drain() < core.DRAIN_BATCH:
+                time.sleep(drain_interval)
+            if args.interval > 0 and time.monotonic() >= next_report:
+                report()
+                next_report += args.interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pooled:
+            client.stop()
+        else:
+            client.loop_stop()
+            client.disconnect()
+        while core.drain():
+            pass
+        report()
+        if args.export:
+            with open(args.export, "w") as f:
+                json.dump(core.stats(), f, indent=2)
+        core.close()
+
+
+if __name__ == "__main__":
+    main()
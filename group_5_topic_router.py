@@ -0,0 +1,229 @@
+import math
+from group_5_history import TieredHistory
+from group_5_sequence import SequenceTracker, device_key
+import group_5_config as config
+
+PIPELINE_KEYS = ["topic", "filter", "device"]
+OVERFLOW_KEY = "(other)"
+
+
+def parse_filters(text):
+    # "site/+/temp, site/#" -> ["site/+/temp", "site/#"], validated and without repeats
+    filters = []
+    for topic_filter in text.split(","):
+        topic_filter = topic_filter.strip()
+        if topic_filter and topic_filter not in filters:
+            validate_filter(topic_filter)
+            filters.append(topic_filter)
+    return filters
+
+
+def validate_filter(topic_filter):
+    levels = topic_filter.split("/")
+    for index, level in enumerate(levels):
+        if "#" in level and (level != "#" or index != len(levels) - 1):
+            raise ValueError(f"'#' must be a whole last level in topic filter '{topic_filter}'")
+        if "+" in level and level != "+":
+            raise ValueError(f"'+' must be a whole level in topic filter '{topic_filter}'")
+
+
+class TrieNode:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children = {}
+        self.values = []
+
+
+class TopicTrie:
+    # MQTT topic filters compiled into a trie of levels. match() walks one level per topic
+    # segment, following the literal child and the "+" child and collecting "#" on the way,
+    # so the cost depends on the topic depth rather than the number of filters
+    def __init__(self, cache_size=config.TOPIC_CACHE_SIZE):
+        self.root = TrieNode()
+        self.cache_size = cache_size
+        self.cache = {}
+        self.filters = 0
+
+    def __len__(self):
+        return self.filters
+
+    def insert(self, topic_filter, value):
+        validate_filter(topic_filter)
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, TrieNode())
+        node.values.append(value)
+        self.filters += 1
+        self.cache.clear()
+
+    def remove(self, topic_filter, value):
+        path = [self.root]
+        for level in topic_filter.split("/"):
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        if value not in path[-1].values:
+            return False
+        path[-1].values.remove(value)
+        self.filters -= 1
+        # Prune the branch back up to the first node still in use
+        for level, parent, node in zip(reversed(topic_filter.split("/")), reversed(path[:-1]), reversed(path[1:])):
+            if node.values or node.children:
+                break
+            del parent.children[level]
+        self.cache.clear()
+        return True
+
+    def match(self, topic):
+        # Values of every filter matching topic, in no particular order
+        matches = self.cache.get(topic)
+        if matches is not None:
+            return matches
+        levels = topic.split("/")
+        found = []
+        nodes = [self.root]
+        for depth, level in enumerate(levels):
+            # Topics starting with "$" are broker internals that wildcards never match
+            wildcards = depth or not level.startswith("$")
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                if wildcards:
+                    rest = children.get("#")
+                    if rest is not None:
+                        found.extend(rest.values)
+                    child = children.get("+")
+                    if child is not None:
+                        next_nodes.append(child)
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+        for node in nodes:
+            found.extend(node.values)
+            # "a/#" also matches "a" itself
+            rest = node.children.get("#")
+            if rest is not None:
+                found.extend(rest.values)
+        matches = tuple(found)
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[topic] = matches
+        return matches
+
+
+class TopicPipeline:
+    # Plot history and statistics for the readings routed to one key
+    def __init__(self, key, raw_capacity=config.PIPELINE_RAW_POINTS, tiers=config.PIPELINE_HISTORY_TIERS):
+        self.key = key
+        self.history = TieredHistory(raw_capacity, tiers)
+        self.sequences = SequenceTracker()
+        self.checked = 0
+        self.anomalies = 0
+
+    def __len__(self):
+        return len(self.sequences)
+
+    @property
+    def received(self):
+        return self.sequences.received
+
+    @property
+    def missing(self):
+        return self.sequences.missing
+
+    @property
+    def late(self):
+        return self.sequences.late
+
+    @property
+    def duplicates(self):
+        return self.sequences.duplicates
+
+    @property
+    def rate(self):
+        return self.anomalies / self.checked if self.checked else 0.0
+
+    def observe(self, time_days, device_id, packet_id, timestamp, value):
+        self.sequences.observe(device_id, packet_id, timestamp)
+        self.history.append(time_days, value)
+        if not math.isnan(value):
+            self.checked += 1
+
+    def clear(self):
+        self.history.clear()
+        self.sequences.clear()
+        self.checked = 0
+        self.anomalies = 0
+
+
+class TopicRouter:
+    # Sends each reading to the pipelines its topic matches. key picks what a pipeline
+    # stands for: every concrete topic, every subscription filter, or every device
+    def __init__(self, filters, key=config.PIPELINE_KEY, max_pipelines=config.PIPELINE_MAX):
+        if key not in PIPELINE_KEYS:
+            raise ValueError(f"Unknown pipeline key: {key}")
+        self.key = key
+        self.max_pipelines = max_pipelines
+        self.filters = list(filters)
+        self.trie = TopicTrie()
+        for topic_filter in self.filters:
+            self.trie.insert(topic_filter, topic_filter)
+        self.pipelines = {}
+        self.routes = {}
+        # Bumped whenever a pipeline is added so views know to refresh their lists
+        self.version = 0
+        self.unmatched = 0
+
+    def __len__(self):
+        return len(self.pipelines)
+
+    def __iter__(self):
+        return iter(self.pipelines.values())
+
+    def get(self, key):
+        return self.pipelines.get(key)
+
+    def pipeline(self, key):
+        pipeline = self.pipelines.get(key)
+        if pipeline is None:
+            if len(self.pipelines) >= self.max_pipelines:
+                key = OVERFLOW_KEY
+                pipeline = self.pipelines.get(key)
+            if pipeline is None:
+                pipeline = self.pipelines[key] = TopicPipeline(key)
+                self.version += 1
+        return pipeline
+
+    def route(self, topic, device_id=None):
+        # Pipelines for one reading. Topic and filter routes are resolved once per topic;
+        # a topic is None when it isn't known (replays of old captures, sharded ingest)
+        if topic is None:
+            return (self.pipeline(f"device_{device_key(device_id)}"),) if self.key == "device" else ()
+        pipelines = self.routes.get(topic)
+        if pipelines is None:
+            filters = self.trie.match(topic)
+            if not filters:
+                self.unmatched += 1
+                return ()
+            if self.key == "topic":
+                pipelines = (self.pipeline(topic),)
+            elif self.key == "filter":
+                pipelines = tuple(dict.fromkeys(self.pipeline(topic_filter) for topic_filter in sorted(filters)))
+            else:
+                pipelines = None
+            if pipelines is not None:
+                if len(self.routes) >= self.trie.cache_size:
+                    self.routes.clear()
+                self.routes[topic] = pipelines
+        if pipelines is None:
+            return (self.pipeline(f"device_{device_key(device_id)}"),)
+        return pipelines
+
+    def clear(self):
+        for pipeline in self.pipelines.values():
+            pipeline.clear()